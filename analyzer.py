@@ -0,0 +1,415 @@
+import consts as c
+import interpreter
+import profiling
+import quasiquote
+from lisp import *
+
+
+class Analyzer(object):
+    """Turns LISP forms into trees of pre-resolved Python closures.
+
+    Every form is inspected exactly once: special forms are resolved,
+    argument lists are sliced and builtins are bound during analysis.
+    Resulting closure takes scope and returns value of the form.
+
+    Forms analyzed in tail position return TailCall instead of calling
+    procedure, Procedure.__call__ runs it without growing Python stack.
+
+    Variables of lambdas are resolved lexically: `env` is a tuple of
+    (names, number of parameters) pairs, innermost lambda first, and
+    references become (depth, slot) lookups in interpreter.Frame.
+    Names not found in `env` are looked up by name in scope found
+    `len(env)` levels up, normally the global one.
+    """
+    SPECIAL_FORMS = symbols({
+        'if': 'analyze_if',
+        c.LAMBDA: 'analyze_lambda',
+        '\\': 'analyze_lambda',
+        'macro': 'analyze_macro',
+        'quasiquote': 'analyze_quasiquote',
+        'define': 'analyze_define',
+        'set!': 'analyze_set_bang',
+        'quote': 'analyze_quote',
+        'while': 'analyze_while',
+        'format': 'analyze_format',
+        'call': 'analyze_call',
+        'begin': 'analyze_begin',
+        'profile': 'analyze_profile',
+        'with-output-to-string': 'analyze_with_output_to_string'
+    })
+
+    # Forms whose bodies do not define variables in enclosing lambda.
+    OPAQUE_FORMS = frozenset(
+        Symbol(name)
+        for name in (c.LAMBDA, '\\', 'macro', c.QUOTE, c.QUASIQUOTE)
+    )
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def analyze(self, item, tail=False, env=()):
+        closure = self.analyze_form(item, tail, env)
+        tracer = self.interpreter.tracer
+
+        if tracer is None:
+            return closure
+
+        def traced(scope):
+            tracer.trace(item)
+            return closure(scope)
+
+        return traced
+
+    def analyze_form(self, item, tail, env):
+        if isinstance(item, Symbol):
+            return self.analyze_symbol(item, env)
+        elif not isinstance(item, list) or len(item) == 0:
+            return self.analyze_constant(item)
+        elif is_symbol(item[0]) and item[0] in self.interpreter.BUILTINS:
+            return self.analyze_builtin(item[0], item[1:], tail, env)
+        else:
+            return self.analyze_application(item[0], item[1:], tail, env)
+
+    def resolve(self, name, env):
+        """Returns (depth, slot, parameter) of variable in `env`.
+
+        Slot is None for variables not bound by any enclosing lambda,
+        depth is then number of frames to skip to reach outer scope.
+        """
+        for (depth, (names, nparams)) in enumerate(env):
+            if name in names:
+                slot = names.index(name)
+                return (depth, slot, slot < nparams)
+
+        return (len(env), None, False)
+
+    def analyze_symbol(self, name, env):
+        (depth, slot, parameter) = self.resolve(name, env)
+
+        if slot is None:
+            return self.analyze_free(name, env)
+
+        if parameter:
+            if depth == 0:
+                return lambda frame: frame.values[slot]
+            elif depth == 1:
+                return lambda frame: frame.outer.values[slot]
+
+        def lookup(frame):
+            for _ in range(depth):
+                frame = frame.outer
+
+            value = frame.values[slot]
+            if value is interpreter.UNBOUND:
+                # Local variable not defined yet, fall back to outer scope.
+                return frame.outer.get(name)
+
+            return value
+
+        return lookup
+
+    def analyze_free(self, name, env):
+        """Returns closure looking up variable not bound by any lambda.
+
+        Frames are skipped unless variables were added to them at runtime
+        (e.g. by define coming from macro expansion), which is detected by
+        frame names being different from the ones known during analysis.
+        """
+        if len(env) == 0:
+            return lambda scope: scope.get(name)
+
+        expected = tuple(names for (names, nparams) in env)
+
+        if len(expected) == 1:
+            (names,) = expected
+
+            def lookup_outer(frame):
+                if frame.names is names:
+                    return frame.outer.get(name)
+                return frame.get(name)
+
+            return lookup_outer
+
+        def lookup(frame):
+            scope = frame
+            for names in expected:
+                if scope.names is not names:
+                    return frame.get(name)
+                scope = scope.outer
+
+            return scope.get(name)
+
+        return lookup
+
+    def analyze_constant(self, value):
+        return lambda scope: value
+
+    def analyze_builtin(self, name, args, tail, env):
+        if name in self.SPECIAL_FORMS:
+            return getattr(self, self.SPECIAL_FORMS[name])(args, tail, env)
+
+        interp = self.interpreter
+        builtin = getattr(interp, interp.BUILTINS[name])
+        function = getattr(builtin, 'primitive', None)
+
+        # Calls are reported to profiler whenever one is attached, like
+        # on tree engine.
+        if hasattr(builtin, 'scoped_primitive'):
+            function = builtin.scoped_primitive
+            profiled = profiling.profiled(name, function)
+            arguments = [self.analyze(x, env=env) for x in args]
+
+            return lambda scope: (
+                function if interp.profiler is None else profiled
+            )(interp, scope, [x(scope) for x in arguments])
+
+        if function is None:
+            # Builtin unknown to analyzer, let it evaluate its own arguments.
+            return lambda scope: builtin(scope, args)
+
+        profiled = profiling.profiled(name, function)
+        arguments = [self.analyze(x, env=env) for x in args]
+
+        if len(arguments) == 0:
+            return lambda scope: (
+                function if interp.profiler is None else profiled
+            )(interp, [])
+        elif len(arguments) == 1:
+            (a,) = arguments
+            return lambda scope: (
+                function if interp.profiler is None else profiled
+            )(interp, [a(scope)])
+        elif len(arguments) == 2:
+            (a, b) = arguments
+            return lambda scope: (
+                function if interp.profiler is None else profiled
+            )(interp, [a(scope), b(scope)])
+        else:
+            return lambda scope: (
+                function if interp.profiler is None else profiled
+            )(interp, [x(scope) for x in arguments])
+
+    def analyze_application(self, head, args, tail, env):
+        operator = self.analyze(head, env=env)
+        operands = [self.analyze(x, env=env) for x in args]
+        apply = self.analyze_apply(args, operands, tail, env)
+
+        return lambda scope: apply(operator(scope), scope)
+
+    def analyze_apply(self, args, operands, tail, env):
+        """Returns closure applying procedure to pre-analyzed operands."""
+        Macro = interpreter.Macro
+        # Macro seen at this site last time and analyzed expansion.
+        cache = [None, None]
+
+        def apply(procedure, scope):
+            if isinstance(procedure, Macro):
+                if cache[0] is not procedure:
+                    lisp = procedure.expand(args)
+                    cache[1] = self.analyze(lisp, tail, env)
+                    cache[0] = procedure
+                return cache[1](scope)
+            elif isinstance(procedure, Procedure):
+                return procedure(*[x(scope) for x in operands])
+            else:
+                raise RuntimeError("Not callable")
+
+        Native = interpreter.Native
+
+        def apply_tail(procedure, scope):
+            if isinstance(procedure, (Macro, Native)):
+                return apply(procedure, scope)
+            elif isinstance(procedure, Procedure):
+                return TailCall(procedure, [x(scope) for x in operands])
+            else:
+                raise RuntimeError("Not callable")
+
+        return apply_tail if tail else apply
+
+    def analyze_if(self, args, tail, env):
+        self.interpreter.assert_rargs("if", args, 2, 3)
+        test = self.analyze(args[0], env=env)
+        then = self.analyze(args[1], tail, env)
+        otherwise = self.analyze(
+            args[2] if len(args) == 3 else c.V_NIL,
+            tail,
+            env
+        )
+
+        def if_(scope):
+            if is_true(test(scope)):
+                return then(scope)
+            return otherwise(scope)
+
+        return if_
+
+    def analyze_define(self, args, tail, env):
+        self.interpreter.assert_nargs("define", args, 2)
+        name = args[0]
+        self.interpreter.assert_type_eval("define", name, 0, c.T_SYMBOL)
+        value = self.analyze(args[1], env=env)
+
+        if len(env) > 0 and name in env[0][0]:
+            slot = env[0][0].index(name)
+
+            def define_local(frame):
+                frame.values[slot] = named(value(frame), name)
+
+            return define_local
+
+        def define(scope):
+            scope.define(name, named(value(scope), name))
+
+        return define
+
+    def analyze_set_bang(self, args, tail, env):
+        self.interpreter.assert_nargs("set!", args, 2)
+        name = args[0]
+        self.interpreter.assert_type_eval("set!", name, 0, c.T_SYMBOL)
+        value = self.analyze(args[1], env=env)
+        (depth, slot, parameter) = self.resolve(name, env)
+
+        if slot is not None and parameter:
+            def set_parameter(frame):
+                result = value(frame)
+                for _ in range(depth):
+                    frame = frame.outer
+                frame.values[slot] = result
+
+            return set_parameter
+        elif slot is not None:
+            def set_local(frame):
+                result = value(frame)
+                for _ in range(depth):
+                    frame = frame.outer
+                if frame.values[slot] is interpreter.UNBOUND:
+                    # Local variable not defined yet, set in outer scope.
+                    frame.outer.set(name, result)
+                else:
+                    frame.values[slot] = result
+
+            return set_local
+
+        def set_bang(scope):
+            scope.set(name, value(scope))
+
+        return set_bang
+
+    def analyze_format(self, args, tail, env):
+        return lambda scope: interpreter.sprintf(args[0], *args[1:])
+
+    def analyze_quote(self, args, tail, env):
+        return self.analyze_constant(from_form(args[0]))
+
+    def analyze_lambda(self, args, tail, env):
+        (parameters, body) = args
+        names = tuple(parameters)
+        names += tuple(self.find_defines(body, names))
+        code = self.analyze(body, True, ((names, len(parameters)),) + env)
+        interp = self.interpreter
+
+        return lambda scope: Procedure(
+            interp, parameters, body, scope, code, names
+        )
+
+    def analyze_macro(self, args, tail, env):
+        (parameters, body) = args
+        names = tuple(parameters)
+        names += tuple(self.find_defines(body, names))
+        code = self.analyze(body, True, ((names, len(parameters)),) + env)
+        interp = self.interpreter
+        Macro = interpreter.Macro
+
+        return lambda scope: Macro(
+            interp, parameters, body, scope, code, names
+        )
+
+    def find_defines(self, body, names):
+        """Returns names defined in body, excluding nested lambdas."""
+        found = []
+        pending = [body]
+
+        while pending:
+            item = pending.pop()
+            if not isinstance(item, list) or len(item) == 0:
+                continue
+
+            if is_symbol(item[0]) and item[0] in self.OPAQUE_FORMS:
+                continue
+
+            if item[0] is S_DEFINE and len(item) == 3:
+                name = item[1]
+                if is_symbol(name) and name not in names and name not in found:
+                    found.append(name)
+
+            pending.extend(reversed(item[1:]))
+
+        return found
+
+    def analyze_quasiquote(self, args, tail, env):
+        template = quasiquote.Template(args[0])
+        if len(template.holes) == 0:
+            return self.analyze_constant(template.build([]))
+
+        holes = [self.analyze(x, env=env) for x in template.holes]
+        build = template.build
+        return lambda scope: build([x(scope) for x in holes])
+
+    def analyze_while(self, args, tail, env):
+        (cond, body) = args
+        cond = self.analyze(cond, env=env)
+        body = self.analyze(body, env=env)
+
+        def while_(scope):
+            while cond(scope):
+                body(scope)
+
+        return while_
+
+    def analyze_call(self, args, tail, env):
+        operator = self.analyze(args[0], env=env)
+        operands = [self.analyze(x, env=env) for x in args[1:]]
+        apply = self.analyze_apply(args[1:], operands, tail, env)
+        # Symbol seen at this site last time and analyzed form.
+        cache = [None, None]
+
+        def call(scope):
+            procedure = operator(scope)
+            if is_symbol(procedure):
+                # Symbol may name a builtin, resolve it dynamically.
+                if cache[0] is not procedure:
+                    lisp = [procedure] + args[1:]
+                    cache[1] = self.analyze(lisp, tail, env)
+                    cache[0] = procedure
+                return cache[1](scope)
+            return apply(procedure, scope)
+
+        return call
+
+    def analyze_profile(self, args, tail, env):
+        interp = self.interpreter
+        interp.assert_nargs("profile", args, 1)
+        body = self.analyze(args[0], env=env)
+
+        return lambda scope: interp.profile(lambda: body(scope))
+
+    def analyze_with_output_to_string(self, args, tail, env):
+        interp = self.interpreter
+        interp.assert_nargs("with-output-to-string", args, 1)
+        body = self.analyze(args[0], env=env)
+
+        return lambda scope: interp.capture_output(lambda: body(scope))
+
+    def analyze_begin(self, args, tail, env):
+        if len(args) == 0:
+            return self.analyze_constant(c.V_NIL)
+
+        body = [self.analyze(x, env=env) for x in args[:-1]]
+        last = self.analyze(args[-1], tail, env)
+
+        def begin(scope):
+            for x in body:
+                x(scope)
+            return last(scope)
+
+        return begin
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# Runs programs of benchmarks/suite on selected engines and reports timings
+# (and peak memory, where tracemalloc is available) as text or JSON.
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE = os.path.join(ROOT, 'benchmarks', 'suite')
+sys.path.insert(0, ROOT)
+
+from interpreter import Interpreter
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+PROGRAMS = sorted(
+    os.path.splitext(os.path.basename(path))[0]
+    for path in glob.glob(os.path.join(SUITE, '*.lisper'))
+)
+
+arguments = argparse.ArgumentParser(description='Benchmark suite runner.')
+arguments.add_argument(
+    'programs',
+    nargs='*',
+    help='programs to run: {} (default: all)'.format(', '.join(PROGRAMS))
+)
+arguments.add_argument(
+    '--engine',
+    action='append',
+    choices=sorted(Interpreter.ENGINES),
+    help='engine to run (default: all)'
+)
+arguments.add_argument('--warmup', type=int, default=1, help='untimed runs')
+arguments.add_argument('--repeat', type=int, default=5, help='timed runs')
+arguments.add_argument(
+    '--no-memory',
+    action='store_true',
+    help='skip measuring peak memory'
+)
+arguments.add_argument('--json', help='write results to file ("-": stdout)')
+arguments.add_argument('--compare', help='JSON results to compare with')
+options = arguments.parse_args()
+
+for name in options.programs:
+    if name not in PROGRAMS:
+        arguments.error("unknown program '{}'".format(name))
+
+
+def read(path):
+    interpreter = Interpreter()
+    with open(path, 'r') as handle:
+        return list(interpreter.read(handle))
+
+
+STDLIB = read(os.path.join(ROOT, 'stdlib.lisper'))
+
+
+def run(engine, forms):
+    """Returns seconds taken by forms on fresh interpreter with stdlib."""
+    interpreter = Interpreter(engine=engine)
+    for lisp in STDLIB:
+        interpreter.evaluate(lisp)
+
+    start = time.time()
+    for lisp in forms:
+        interpreter.evaluate(lisp)
+    return time.time() - start
+
+
+def peak_memory(engine, forms):
+    tracemalloc.start()
+    try:
+        run(engine, forms)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(engine, forms):
+    for _ in range(options.warmup):
+        run(engine, forms)
+
+    times = sorted(run(engine, forms) for _ in range(options.repeat))
+    result = {
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'mean': sum(times) / len(times),
+        'times': times,
+        'peak_memory': None
+    }
+
+    if tracemalloc is not None and not options.no_memory:
+        result['peak_memory'] = peak_memory(engine, forms)
+
+    return result
+
+
+def commit():
+    try:
+        with open(os.devnull, 'w') as null:
+            output = subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=ROOT,
+                stderr=null
+            )
+        return output.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Stable layout without trailing spaces, so reports diff cleanly.
+FORMAT = {'indent': 2, 'sort_keys': True, 'separators': (',', ': ')}
+
+results = {}
+engines = options.engine or sorted(Interpreter.ENGINES)
+previous = None
+
+if options.compare is not None:
+    with open(options.compare, 'r') as handle:
+        previous = json.load(handle)['results']
+
+for name in options.programs or PROGRAMS:
+    forms = read(os.path.join(SUITE, name + '.lisper'))
+    results[name] = {}
+
+    for engine in engines:
+        result = measure(engine, forms)
+        results[name][engine] = result
+
+        line = "{:10} {:8} {:8.3f}s".format(name, engine, result['min'])
+        if result['peak_memory'] is not None:
+            line += " {:10.1f}KiB".format(result['peak_memory'] / 1024.0)
+        if previous is not None and engine in previous.get(name, {}):
+            line += " {:+7.1%}".format(
+                result['min'] / previous[name][engine]['min'] - 1
+            )
+        print(line, file=sys.stderr if options.json == '-' else sys.stdout)
+
+report = {
+    'commit': commit(),
+    'python': platform.python_version(),
+    'warmup': options.warmup,
+    'repeat': options.repeat,
+    'results': results
+}
+
+if options.json == '-':
+    json.dump(report, sys.stdout, **FORMAT)
+    print()
+elif options.json is not None:
+    with open(options.json, 'w') as handle:
+        json.dump(report, handle, **FORMAT)
+        handle.write('\n')
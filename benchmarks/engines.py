@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Compares engines on naive fib and repeated fact.
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interpreter import Interpreter
+
+PROGRAMS = {
+    'fib': """
+(begin
+ (define fib (lambda (n)
+               (if (< n 2)
+                   n
+                 (+ (fib (- n 2)) (fib (- n 1))))))
+ (fib {n}))
+""",
+    'fact': """
+(begin
+ (define fact (lambda (n)
+                (if (<= n 1)
+                    1
+                  (* n (fact (- n 1))))))
+ (define i 0)
+ (while (< i {n})
+   (begin
+    (fact 20)
+    (set! i (+ i 1)))))
+"""
+}
+
+SIZES = {'fib': 20, 'fact': 1000}
+
+arguments = argparse.ArgumentParser(description='Engine benchmark.')
+arguments.add_argument('--repeat', type=int, default=3, help='runs per case')
+arguments.add_argument(
+    '--engine',
+    action='append',
+    choices=sorted(Interpreter.ENGINES),
+    help='engine to run (default: all)'
+)
+options = arguments.parse_args()
+
+for name in sorted(PROGRAMS):
+    code = PROGRAMS[name].format(n=SIZES[name])
+    for engine in options.engine or sorted(Interpreter.ENGINES):
+        best = None
+        for _ in range(options.repeat):
+            interpreter = Interpreter(engine=engine)
+            start = time.time()
+            interpreter.interpret(code)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        print("{:6} {:10} {:8.3f}s".format(name, engine, best))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# Measures requests evaluated by server worker, fails if changes made by
+# one request to global variables are seen by the next one.
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+from interpreter import Interpreter
+
+# Global variables of worker, as if defined by stdlib.
+GLOBALS = """
+(define table (make-hash '((a 1))))
+(define tables (list table))
+(define v (vector 1 2 3))
+(define count 0)
+(define bump (lambda () (set! count (+ count 1))))
+(define square (memoize (lambda (x) (* x x))))
+"""
+
+# Reports what it sees, then changes all of it.
+PROGRAM = """
+(define seen (list (hash-count table) (hash-get (car tables) 'b 'none)
+                   (vector-ref v 0) count
+                   (hash-get (memo-stats square) 'misses)))
+(hash-set! table 'b 2)
+(set! v (vector 9))
+(bump)
+(square 3)
+seen
+"""
+
+arguments = argparse.ArgumentParser(description='Server benchmark.')
+arguments.add_argument('-n', type=int, default=200, help='requests')
+arguments.add_argument(
+    '--engine',
+    action='append',
+    choices=sorted(Interpreter.ENGINES),
+    help='engine to run (default: all)'
+)
+options = arguments.parse_args()
+
+failed = False
+for engine in options.engine or sorted(Interpreter.ENGINES):
+    forms = list(Interpreter(engine=engine).read(GLOBALS))
+    server.start(engine, forms, None)
+
+    responses = []
+    start = time.time()
+    for _ in range(options.n):
+        responses.append(server.run(PROGRAM))
+    elapsed = time.time() - start
+
+    values = set((r['value'], r['error']) for r in responses)
+    print("{:10} {:8.3f}ms per request, responses: {}".format(
+        engine,
+        elapsed / options.n * 1000,
+        ", ".join(sorted(str(value) for value in values))
+    ))
+    if values != set([("(1 none 1.0 0 0)", None)]):
+        failed = True
+
+if failed:
+    print("Requests are not isolated.")
+    sys.exit(1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Compares startup of main.py and parsing of large file with and without
+# parsed forms cache, fails if cold start of main.py exceeds the budget.
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache
+from interpreter import Interpreter
+
+DEFINE = "(define f{0} (lambda (x) (if (< x {0}) (+ x {0}) (list x '(a b)))))\n"
+
+arguments = argparse.ArgumentParser(description='Startup benchmark.')
+arguments.add_argument('--repeat', type=int, default=5, help='runs per case')
+arguments.add_argument(
+    '--script',
+    default=os.path.join(ROOT, 'examples', 'hello_world.lisper'),
+    help='script run by main.py'
+)
+arguments.add_argument(
+    '--defines',
+    type=int,
+    default=2000,
+    help='number of definitions in parsed file'
+)
+arguments.add_argument(
+    '--budget',
+    type=float,
+    default=0.15,
+    help='maximum seconds of main.py startup with cached forms'
+)
+options = arguments.parse_args()
+
+
+def best(function):
+    result = None
+    for _ in range(options.repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+directory = tempfile.mkdtemp()
+try:
+    def main(*flags):
+        command = [sys.executable, 'main.py', '--cache-dir', directory]
+        with open(os.devnull, 'w') as null:
+            subprocess.check_call(
+                command + list(flags) + [options.script],
+                cwd=ROOT,
+                stdout=null
+            )
+
+    main()
+    print("{:24} {:8.3f}s".format("main.py --no-cache", best(
+        lambda: main('--no-cache')
+    )))
+    startup = best(main)
+    print("{:24} {:8.3f}s (budget {:.3f}s)".format(
+        "main.py (cached)",
+        startup,
+        options.budget
+    ))
+
+    path = os.path.join(directory, 'large.lisper')
+    with open(path, 'w') as handle:
+        handle.write("(begin\n")
+        for i in range(options.defines):
+            handle.write(DEFINE.format(i))
+        handle.write(")\n")
+
+    interpreter = Interpreter()
+    parse_cache = cache.ParseCache(interpreter, directory)
+    parse_cache.read(path)
+    print("{:24} {:8.3f}s".format("parse large file", best(
+        lambda: list(cache.read(interpreter, path))
+    )))
+    print("{:24} {:8.3f}s".format("load large file", best(
+        lambda: parse_cache.read(path)
+    )))
+finally:
+    shutil.rmtree(directory)
+
+if startup > options.budget:
+    print("Startup exceeds budget.")
+    sys.exit(1)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# Runs tail recursive loop with given number of iterations on every engine.
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interpreter import Interpreter
+
+CODE = """
+(begin
+ (define loop (lambda (i acc)
+                (if (= i 0)
+                    acc
+                  (loop (- i 1) (+ acc 1)))))
+ (loop {} 0))
+"""
+
+arguments = argparse.ArgumentParser(description='Tail call benchmark.')
+arguments.add_argument('-n', type=int, default=1000000, help='iterations')
+arguments.add_argument(
+    '--engine',
+    action='append',
+    choices=sorted(Interpreter.ENGINES),
+    help='engine to run (default: all)'
+)
+options = arguments.parse_args()
+
+for engine in options.engine or sorted(Interpreter.ENGINES):
+    interpreter = Interpreter(engine=engine)
+    start = time.time()
+    result = interpreter.interpret(CODE.format(options.n))
+    elapsed = time.time() - start
+
+    assert result == options.n
+    print("{:10} {:>10} iterations {:8.3f}s".format(engine, options.n, elapsed))
@@ -0,0 +1,425 @@
+import consts as c
+import interpreter
+import profiling
+import quasiquote
+from lisp import *
+
+# Opcodes, every instruction is a pair of integers (opcode, argument).
+CONST = 0           # push constants[arg]
+LOAD_LOCAL = 1      # push parameter from slot arg of current frame
+LOAD_DEREF = 2      # push variable described by constants[arg] (Ref)
+LOAD_FREE = 3       # push variable named constants[arg] (FreeRef)
+STORE_LOCAL = 4     # pop into parameter from slot arg of current frame
+STORE_DEREF = 5     # pop into variable described by constants[arg] (Ref)
+DEFINE = 6          # pop and define variable named constants[arg]
+SET = 7             # pop and set variable named constants[arg]
+POP = 8             # discard top of stack
+JUMP = 9            # continue at arg
+JUMP_IF_NIL = 10    # pop, continue at arg if value is nil
+JUMP_IF_FALSE = 11  # pop, continue at arg if value is false in Python
+PRIMITIVE = 12      # pop constants[arg].argc values, push result of primitive
+BUILTIN = 13        # push result of builtin evaluating constants[arg].args
+DISPATCH = 14       # handle macro (or symbol) on top of stack, see Site
+CALL = 15           # pop arg values and procedure, push result of call
+TAILCALL = 16       # like CALL, but replaces current frame
+RETURN = 17         # return top of stack from code
+CLOSURE = 18        # push lambda with body constants[arg] (CodeObject)
+MACRO = 19          # push macro with body constants[arg] (CodeObject)
+FORMAT = 20         # push constants[arg] formatted
+TRACE = 21          # pass constants[arg] to tracer
+SCOPED_PRIMITIVE = 22  # like PRIMITIVE, but passes also current frame
+DEFINE_LOCAL = 23   # like STORE_LOCAL, but names stored procedure
+PROFILE = 24        # push result of constants[arg] run under profiler
+CAPTURE = 25        # push output printed by constants[arg] as string
+
+OPNAMES = [
+    'CONST', 'LOAD_LOCAL', 'LOAD_DEREF', 'LOAD_FREE', 'STORE_LOCAL',
+    'STORE_DEREF', 'DEFINE', 'SET', 'POP', 'JUMP', 'JUMP_IF_NIL',
+    'JUMP_IF_FALSE', 'PRIMITIVE', 'BUILTIN', 'DISPATCH', 'CALL',
+    'TAILCALL', 'RETURN', 'CLOSURE', 'MACRO', 'FORMAT', 'TRACE',
+    'SCOPED_PRIMITIVE', 'DEFINE_LOCAL', 'PROFILE', 'CAPTURE'
+]
+
+JUMPS = (JUMP, JUMP_IF_NIL, JUMP_IF_FALSE)
+
+
+class CodeObject(object):
+    """Compiled form or body of lambda/macro.
+
+    Calling code object with interpreter.Frame runs it on the VM,
+    so it can be used as Procedure.code.
+    """
+    def __init__(self, vm, parameters=None, body=None, names=None):
+        self.vm = vm
+        self.ops = []
+        self.constants = []
+        self.parameters = parameters
+        self.body = body
+        self.names = names
+
+    def __call__(self, frame):
+        return self.vm.execute(self, frame)
+
+    def emit(self, op, arg=0):
+        self.ops.append(op)
+        self.ops.append(arg)
+        return len(self.ops) - 2
+
+    def constant(self, value):
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def label(self):
+        return len(self.ops)
+
+    def patch(self, position, target):
+        self.ops[position + 1] = target
+
+
+class Ref(object):
+    """Slot of variable `depth` frames up from the current one."""
+    __slots__ = ('name', 'depth', 'slot')
+
+    def __init__(self, name, depth, slot):
+        self.name = name
+        self.depth = depth
+        self.slot = slot
+
+    def __repr__(self):
+        return "{} depth={} slot={}".format(self.name, self.depth, self.slot)
+
+
+class FreeRef(object):
+    """Variable not bound by lambda, `expected` are names of frames to skip."""
+    __slots__ = ('name', 'expected')
+
+    def __init__(self, name, expected):
+        self.name = name
+        self.expected = expected
+
+    def __repr__(self):
+        return "{} depth={}".format(self.name, len(self.expected))
+
+
+class PrimitiveCall(object):
+    """Call of primitive builtin, `profiled` is used while profiling."""
+    __slots__ = ('name', 'function', 'profiled', 'argc')
+
+    def __init__(self, name, function, profiled, argc):
+        self.name = name
+        self.function = function
+        self.profiled = profiled
+        self.argc = argc
+
+    def __repr__(self):
+        return "{}/{}".format(self.name, self.argc)
+
+
+class BuiltinCall(object):
+    __slots__ = ('name', 'builtin', 'args')
+
+    def __init__(self, name, builtin, args):
+        self.name = name
+        self.builtin = builtin
+        self.args = args
+
+    def __repr__(self):
+        return "{}".format(self.name)
+
+
+class Site(object):
+    """Call site which may turn out to be macro application at runtime.
+
+    If value on top of stack is macro (or symbol naming builtin, for
+    `call`), VM pops it, evaluates form built from it and `args`,
+    pushes the result and continues at `end`. Code of the form is
+    cached together with the value (`key`) it was built for.
+    """
+    __slots__ = ('args', 'env', 'tail', 'symbols', 'end', 'key', 'code')
+
+    def __init__(self, args, env, tail, symbols):
+        self.args = args
+        self.env = env
+        self.tail = tail
+        self.symbols = symbols
+        self.end = None
+        self.key = None
+        self.code = None
+
+    def __repr__(self):
+        return "({}) end={}".format(
+            " ".join([to_lisp(x) for x in self.args]),
+            self.end
+        )
+
+
+class Compiler(object):
+    """Compiles LISP forms into CodeObjects run by vm.VM.
+
+    Variables are resolved the same way as in analyzer.Analyzer.
+    """
+    SPECIAL_FORMS = symbols({
+        'if': 'compile_if',
+        c.LAMBDA: 'compile_lambda',
+        '\\': 'compile_lambda',
+        'macro': 'compile_macro',
+        'quasiquote': 'compile_quasiquote',
+        'define': 'compile_define',
+        'set!': 'compile_set_bang',
+        'quote': 'compile_quote',
+        'while': 'compile_while',
+        'format': 'compile_format',
+        'call': 'compile_call',
+        'begin': 'compile_begin',
+        'profile': 'compile_profile',
+        'with-output-to-string': 'compile_with_output_to_string'
+    })
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def compile(self, item, env=(), tail=False):
+        """Returns CodeObject evaluating form in scope matching `env`."""
+        code = CodeObject(self.interpreter.vm)
+        self.compile_form(code, item, tail, env)
+        code.emit(RETURN)
+        return code
+
+    def compile_body(self, parameters, body, names, env):
+        code = CodeObject(self.interpreter.vm, parameters, body, names)
+        self.compile_form(code, body, True, env)
+        code.emit(RETURN)
+        return code
+
+    def compile_form(self, code, item, tail, env):
+        if self.interpreter.tracer is not None:
+            code.emit(TRACE, code.constant(item))
+
+        if isinstance(item, Symbol):
+            self.compile_symbol(code, item, env)
+        elif not isinstance(item, list) or len(item) == 0:
+            code.emit(CONST, code.constant(item))
+        elif is_symbol(item[0]) and item[0] in self.interpreter.BUILTINS:
+            self.compile_builtin(code, item[0], item[1:], tail, env)
+        else:
+            self.compile_application(code, item[0], item[1:], tail, env)
+
+    def compile_symbol(self, code, name, env):
+        (depth, slot, parameter) = self.interpreter.analyzer.resolve(name, env)
+
+        if slot is None:
+            expected = tuple(names for (names, nparams) in env)
+            code.emit(LOAD_FREE, code.constant(FreeRef(name, expected)))
+        elif parameter and depth == 0:
+            code.emit(LOAD_LOCAL, slot)
+        else:
+            code.emit(LOAD_DEREF, code.constant(Ref(name, depth, slot)))
+
+    def compile_builtin(self, code, name, args, tail, env):
+        if name in self.SPECIAL_FORMS:
+            getattr(self, self.SPECIAL_FORMS[name])(code, args, tail, env)
+            return
+
+        interp = self.interpreter
+        builtin = getattr(interp, interp.BUILTINS[name])
+        function = getattr(builtin, 'primitive', None)
+        scoped = hasattr(builtin, 'scoped_primitive')
+
+        if scoped:
+            function = builtin.scoped_primitive
+        elif function is None:
+            # Builtin unknown to compiler, let it evaluate its own arguments.
+            code.emit(BUILTIN, code.constant(BuiltinCall(name, builtin, args)))
+            return
+
+        for x in args:
+            self.compile_form(code, x, False, env)
+
+        code.emit(
+            SCOPED_PRIMITIVE if scoped else PRIMITIVE,
+            code.constant(PrimitiveCall(
+                name, function, profiling.profiled(name, function), len(args)
+            ))
+        )
+
+    def compile_application(self, code, head, args, tail, env, symbols=False):
+        self.compile_form(code, head, False, env)
+
+        site = Site(args, env, tail, symbols)
+        code.emit(DISPATCH, code.constant(site))
+
+        for x in args:
+            self.compile_form(code, x, False, env)
+
+        code.emit(TAILCALL if tail else CALL, len(args))
+        site.end = code.label()
+
+    def compile_if(self, code, args, tail, env):
+        self.interpreter.assert_rargs("if", args, 2, 3)
+        self.compile_form(code, args[0], False, env)
+        otherwise = code.emit(JUMP_IF_NIL)
+        self.compile_form(code, args[1], tail, env)
+        end = code.emit(JUMP)
+        code.patch(otherwise, code.label())
+        self.compile_form(
+            code,
+            args[2] if len(args) == 3 else c.V_NIL,
+            tail,
+            env
+        )
+        code.patch(end, code.label())
+
+    def compile_define(self, code, args, tail, env):
+        self.interpreter.assert_nargs("define", args, 2)
+        name = args[0]
+        self.interpreter.assert_type_eval("define", name, 0, c.T_SYMBOL)
+        self.compile_form(code, args[1], False, env)
+
+        if len(env) > 0 and name in env[0][0]:
+            code.emit(DEFINE_LOCAL, env[0][0].index(name))
+        else:
+            code.emit(DEFINE, code.constant(name))
+
+        code.emit(CONST, code.constant(None))
+
+    def compile_set_bang(self, code, args, tail, env):
+        self.interpreter.assert_nargs("set!", args, 2)
+        name = args[0]
+        self.interpreter.assert_type_eval("set!", name, 0, c.T_SYMBOL)
+        self.compile_form(code, args[1], False, env)
+        (depth, slot, parameter) = self.interpreter.analyzer.resolve(name, env)
+
+        if slot is None:
+            code.emit(SET, code.constant(name))
+        elif parameter and depth == 0:
+            code.emit(STORE_LOCAL, slot)
+        else:
+            code.emit(STORE_DEREF, code.constant(Ref(name, depth, slot)))
+
+        code.emit(CONST, code.constant(None))
+
+    def compile_format(self, code, args, tail, env):
+        code.emit(FORMAT, code.constant(args))
+
+    def compile_quote(self, code, args, tail, env):
+        code.emit(CONST, code.constant(from_form(args[0])))
+
+    def compile_lambda(self, code, args, tail, env):
+        (parameters, body) = args
+        names = tuple(parameters)
+        names += tuple(self.interpreter.analyzer.find_defines(body, names))
+        env = ((names, len(parameters)),) + env
+        code.emit(
+            CLOSURE,
+            code.constant(self.compile_body(parameters, body, names, env))
+        )
+
+    def compile_macro(self, code, args, tail, env):
+        (parameters, body) = args
+        names = tuple(parameters)
+        names += tuple(self.interpreter.analyzer.find_defines(body, names))
+        env = ((names, len(parameters)),) + env
+        code.emit(
+            MACRO,
+            code.constant(self.compile_body(parameters, body, names, env))
+        )
+
+    def compile_quasiquote(self, code, args, tail, env):
+        template = quasiquote.Template(args[0])
+        for x in template.holes:
+            self.compile_form(code, x, False, env)
+
+        # Values of holes are assembled like arguments of primitive, not
+        # reported to profiler (like on tree engine).
+        build = template.build
+        function = lambda interp, values: build(values)
+        code.emit(PRIMITIVE, code.constant(PrimitiveCall(
+            c.QUASIQUOTE, function, function, len(template.holes)
+        )))
+
+    def compile_while(self, code, args, tail, env):
+        (cond, body) = args
+        start = code.label()
+        self.compile_form(code, cond, False, env)
+        end = code.emit(JUMP_IF_FALSE)
+        self.compile_form(code, body, False, env)
+        code.emit(POP)
+        code.emit(JUMP, start)
+        code.patch(end, code.label())
+        code.emit(CONST, code.constant(None))
+
+    def compile_call(self, code, args, tail, env):
+        self.compile_application(code, args[0], args[1:], tail, env, True)
+
+    def compile_profile(self, code, args, tail, env):
+        interp = self.interpreter
+        interp.assert_nargs("profile", args, 1)
+        body = self.compile(args[0], env)
+        code.emit(PROFILE, code.constant(body))
+
+    def compile_with_output_to_string(self, code, args, tail, env):
+        self.interpreter.assert_nargs("with-output-to-string", args, 1)
+        code.emit(CAPTURE, code.constant(self.compile(args[0], env)))
+
+    def compile_begin(self, code, args, tail, env):
+        if len(args) == 0:
+            code.emit(CONST, code.constant(c.V_NIL))
+            return
+
+        for x in args[:-1]:
+            self.compile_form(code, x, False, env)
+            code.emit(POP)
+
+        self.compile_form(code, args[-1], tail, env)
+
+
+def disassemble(code, indent=""):
+    """Returns human readable listing of CodeObject and nested ones."""
+    lines = []
+    nested = []
+
+    for pc in range(0, len(code.ops), 2):
+        op = code.ops[pc]
+        arg = code.ops[pc + 1]
+        name = OPNAMES[op]
+
+        if op in (CONST, LOAD_DEREF, LOAD_FREE, STORE_DEREF, DEFINE, SET,
+                  PRIMITIVE, SCOPED_PRIMITIVE, BUILTIN, DISPATCH, FORMAT,
+                  TRACE):
+            value = code.constants[arg]
+            if isinstance(value, (Ref, FreeRef, PrimitiveCall, BuiltinCall,
+                                  Site)):
+                detail = repr(value)
+            else:
+                detail = to_lisp(value) if value is not None else 'None'
+            line = "{:4} {:14} {:3} ({})".format(pc, name, arg, detail)
+        elif op in (CLOSURE, MACRO, PROFILE, CAPTURE):
+            body = code.constants[arg]
+            nested.append(body)
+            line = "{:4} {:14} {:3} (code #{})".format(
+                pc, name, arg, len(nested)
+            )
+        elif op in JUMPS:
+            line = "{:4} {:14} {:3} (to {})".format(pc, name, arg, arg)
+        elif op == RETURN or op == POP:
+            line = "{:4} {}".format(pc, name)
+        else:
+            line = "{:4} {:14} {:3}".format(pc, name, arg)
+
+        lines.append(indent + line)
+
+    for (number, body) in enumerate(nested, 1):
+        lines.append("")
+        if body.parameters is None:
+            # Form run by PROFILE or CAPTURE.
+            lines.append("{}code #{}:".format(indent, number))
+        else:
+            lines.append("{}code #{}: ({}) {}".format(
+                indent,
+                number,
+                " ".join([to_lisp(x) for x in body.parameters]),
+                to_lisp(body.body)
+            ))
+        lines.append(disassemble(body, indent + "  "))
+
+    return "\n".join(lines)
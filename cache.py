@@ -0,0 +1,92 @@
+import hashlib
+import os
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Bump when format of parsed forms changes, so old entries are ignored.
+VERSION = 4
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'lisper')
+
+
+def digest(data):
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+class ParseCache(object):
+    """Keeps parsed forms of LISP files on disk, so they are parsed once.
+
+    Every source path has one entry (named after hash of the path) holding
+    hash of the content it was parsed from; entries of changed files are
+    parsed again and replaced. Cache which cannot be read or written is
+    silently ignored.
+
+    Reader is anything with `read` method returning forms of string,
+    e.g. Interpreter.
+    """
+    def __init__(self, reader, directory=DEFAULT_DIRECTORY):
+        self.reader = reader
+        self.directory = directory
+
+    def entry(self, path):
+        name = digest(os.path.abspath(path))
+        return os.path.join(self.directory, name + '.pickle')
+
+    def load(self, entry, checksum):
+        try:
+            with open(entry, 'rb') as handle:
+                (version, stored, lisp) = pickle.load(handle)
+        except Exception:
+            return None
+
+        if version != VERSION or stored != checksum:
+            return None
+
+        return lisp
+
+    def store(self, entry, checksum, lisp):
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            # Written aside and renamed, so readers never see partial entry.
+            (fd, temporary) = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'wb') as handle:
+                pickle.dump(
+                    (VERSION, checksum, lisp),
+                    handle,
+                    pickle.HIGHEST_PROTOCOL
+                )
+            os.rename(temporary, entry)
+        except (IOError, OSError):
+            pass
+
+    def read(self, path):
+        """Returns list of forms of file, from cache if it is up to date."""
+        with open(path, 'rb') as handle:
+            data = handle.read()
+
+        entry = self.entry(path)
+        checksum = digest(data)
+        lisp = self.load(entry, checksum)
+
+        if lisp is None:
+            if not isinstance(data, str):
+                data = data.decode('utf-8')
+            lisp = list(self.reader.read(data))
+            self.store(entry, checksum, lisp)
+
+        return lisp
+
+
+def read(reader, path):
+    """Yields forms of file as they are read, bypassing cache."""
+    with open(path, 'r') as handle:
+        for lisp in reader.read(handle):
+            yield lisp
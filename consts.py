@@ -10,6 +10,7 @@ V_NIL = []
 QUOTE = 'quote'
 QUASIQUOTE = 'quasiquote'
 UNQUOTE = 'unquote'
+UNQUOTE_SPLICING = 'unquote-splicing'
 LAMBDA = 'lambda'
 
 # Type names
@@ -21,3 +22,6 @@ T_LIST = 'list'
 T_BOOLEAN = 'boolean'
 T_LAMBDA = 'lambda'
 T_NIL = 'nil'
+T_HASH = 'hash'
+T_VECTOR = 'vector'
+T_SEQUENCE = 'sequence'
@@ -0,0 +1,127 @@
+import io
+import os
+import sys
+import interpreter
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Bump when format of images (or of anything they hold) changes,
+# so images made by older versions are rejected.
+VERSION = 3
+
+
+def tag():
+    """Returns tag identifying images loadable by this version."""
+    return (VERSION, sys.version_info[0])
+
+
+def save(interp, path):
+    """Writes global scope of interpreter with everything it holds.
+
+    Procedures are saved without pre-analyzed bodies, they are analyzed
+    again on their first call after being loaded. The interpreter itself
+    is saved by reference and replaced with the loading one. Image is
+    written into temporary file renamed to path once complete, so failed
+    save leaves previous image (if any) as it was.
+    """
+    temporary = path + '.tmp'
+    try:
+        with open(temporary, 'wb') as handle:
+            dump(interp, handle, [tag(), interp.scope])
+        os.rename(temporary, path)
+    except (IOError, OSError) as e:
+        remove(temporary)
+        raise RuntimeError("Cannot write image '{}': {}.".format(path, e))
+    except Exception as e:
+        remove(temporary)
+        raise RuntimeError("Cannot save image '{}': {}.".format(
+            path,
+            describe(interp, e)
+        ))
+
+
+def dump(interp, handle, values, scope=None):
+    """Pickles values into handle, `scope` (if any) by reference."""
+    def persistent_id(value):
+        if value is interp:
+            return 'interpreter'
+        elif value is interpreter.UNBOUND:
+            return 'unbound'
+        elif value is scope and scope is not None:
+            return 'scope'
+        return None
+
+    pickler = pickle.Pickler(handle, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    interp.saving_image = True
+    try:
+        for value in values:
+            pickler.dump(value)
+    finally:
+        interp.saving_image = False
+
+
+def describe(interp, error):
+    """Returns which global variable holds value failing to be saved."""
+    # Global scope, which procedures refer to, is left out.
+    variables = sorted(
+        interp.scope.data.items(),
+        key=lambda item: item[0].name
+    )
+    for (name, value) in variables:
+        try:
+            dump(interp, io.BytesIO(), [value], interp.scope)
+        except Exception as e:
+            return "value of '{}' cannot be saved ({})".format(name, e)
+    return error
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def load(interp, path):
+    """Replaces global scope of interpreter with one saved in image."""
+    def persistent_load(key):
+        if key == 'interpreter':
+            return interp
+        elif key == 'unbound':
+            return interpreter.UNBOUND
+        raise pickle.UnpicklingError("Unknown reference '{}'.".format(key))
+
+    try:
+        handle = open(path, 'rb')
+    except (IOError, OSError) as e:
+        raise RuntimeError("Cannot read image '{}': {}.".format(path, e))
+
+    with handle:
+        unpickler = pickle.Unpickler(handle)
+        unpickler.persistent_load = persistent_load
+
+        try:
+            version = unpickler.load()
+        except Exception:
+            raise RuntimeError("File '{}' is not an image.".format(path))
+
+        # Checked first, content of stale image may not load at all.
+        if version != tag():
+            raise RuntimeError(
+                "Image '{}' was made by other version, make it again.".format(
+                    path
+                )
+            )
+
+        try:
+            scope = unpickler.load()
+        except Exception:
+            raise RuntimeError("Image '{}' is damaged.".format(path))
+
+    interp.scope = scope
+    interp.expansions.clear()
+    interp.templates.clear()
@@ -1,7 +1,20 @@
 from __future__ import print_function
 from __future__ import division
 import sys
-import syntax
+import collections
+import operator
+import multiprocessing
+import reader
+import profiling
+import parallel
+import analyzer
+import optimizer
+import bytecode
+import vm
+import vectors
+import sequences
+import quasiquote
+import ports
 from lisp import *
 
 
@@ -10,6 +23,8 @@ def sprintf(format, *values):
 
 
 class Scope(object):
+    __slots__ = ('data', 'outer')
+
     def __init__(self, parameters=[], arguments=[], outer=None):
         self.data = dict()
         self.data.update(zip(parameters, arguments))
@@ -26,7 +41,15 @@ class Scope(object):
             return self.outer.find(name)
 
     def get(self, name):
-        return self.find(name).data[name]
+        try:
+            return self.data[name]
+        except KeyError:
+            if self.outer is None:
+                raise RuntimeError(
+                    "Attempt to use not existing variable '{}'.".format(name)
+                )
+
+            return self.outer.get(name)
 
     def define(self, name, value):
         # Creates new variable.
@@ -35,18 +58,211 @@ class Scope(object):
     def set(self, name, value):
         # Changes existing variable or creates new variable.
         try:
-            self.find(name).data[name] = value
+            self.find(name).define(name, value)
+        except:
+            self.define(name, value)
+
+
+# Value of frame slot reserved for variable which is not defined yet.
+UNBOUND = object()
+
+
+class Frame(object):
+    """Scope of analyzed procedure call, variables live in fixed slots.
+
+    Analyzer resolves references to (depth, slot) pairs and reads `values`
+    directly; lookups by name are supported for code analyzed dynamically.
+    """
+    __slots__ = ('names', 'values', 'outer')
+
+    def __init__(self, names, values, outer):
+        self.names = names
+        self.values = values
+        self.outer = outer
+
+    def slot(self, name):
+        if name in self.names:
+            index = self.names.index(name)
+            if self.values[index] is not UNBOUND:
+                return index
+
+        return None
+
+    def find(self, name):
+        if self.slot(name) is not None:
+            return self
+
+        return self.outer.find(name)
+
+    def get(self, name):
+        index = self.slot(name)
+        if index is None:
+            return self.outer.get(name)
+
+        return self.values[index]
+
+    def define(self, name, value):
+        # Creates new variable, extending frame if it has no slot for it.
+        if name in self.names:
+            self.values[self.names.index(name)] = value
+        else:
+            self.names = self.names + (name,)
+            self.values.append(value)
+
+    def set(self, name, value):
+        # Changes existing variable or creates new variable.
+        try:
+            self.find(name).define(name, value)
         except:
             self.define(name, value)
 
 
 class Macro(Procedure):
-    pass
+    def expand(self, args):
+        """Returns form produced by macro from unevaluated args."""
+        return to_form(self(*[from_form(x) for x in args]))
+
+
+class Native(Procedure):
+    """Procedure implemented in Python, see Interpreter.NATIVES.
+
+    Unlike builtins natives are ordinary values of global variables,
+    so they can be passed around and redefined by LISP code.
+    """
+    def __init__(self, interpreter, name, function):
+        Procedure.__init__(
+            self, interpreter, [], Symbol(name), None, function, name=name
+        )
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        interpreter = self.interpreter
+        self.code = getattr(interpreter, interpreter.NATIVES[self.name])
+
+    def __call__(self, *arguments):
+        profiler = self.interpreter.profiler
+        if profiler is None:
+            return self.code(list(arguments))
+
+        profiler.enter(self.name)
+        try:
+            return self.code(list(arguments))
+        finally:
+            profiler.exit()
+
+
+class Memoized(Native):
+    """Procedure remembering results of another one, see native_memoize.
+
+    Results are keyed by arguments (see hash_key, so 1 and 1.0 are not
+    the same argument), which therefore must be hashable (numbers,
+    strings, symbols and lists of them). At most `size` results are kept,
+    the least recently used one is evicted first.
+    """
+    def __init__(self, interpreter, procedure, size):
+        Procedure.__init__(
+            self, interpreter, procedure.parameters, procedure.body, None,
+            self.lookup, name=procedure.name
+        )
+        self.procedure = procedure
+        self.size = size
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.code = self.lookup
+
+    def lookup(self, arguments):
+        try:
+            key = tuple(hash_key(x) for x in arguments)
+            # Popped and stored again to become the most recently used.
+            value = self.results.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            value = self.procedure(*arguments)
+            while len(self.results) >= self.size:
+                self.results.popitem(last=False)
+        except TypeError:
+            raise RuntimeError("memoize: arguments must be hashable.")
+
+        self.results[key] = value
+        return value
+
+
+def primitive(method):
+    """Marks builtin as primitive, i.e. operating on evaluated arguments.
+
+    Tree-walking engine evaluates arguments before calling the builtin,
+    other engines call the unwrapped method (available as `primitive`)
+    with arguments they evaluated on their own.
+    """
+    def builtin(self, scope, args):
+        return method(self, self.eval_all(args, scope))
+
+    builtin.primitive = method
+    builtin.__name__ = method.__name__
+    builtin.__doc__ = method.__doc__
+    return builtin
+
+
+def scoped_primitive(method):
+    """Like primitive, but method receives also scope of the call."""
+    def builtin(self, scope, args):
+        return method(self, scope, self.eval_all(args, scope))
+
+    builtin.scoped_primitive = method
+    builtin.__name__ = method.__name__
+    builtin.__doc__ = method.__doc__
+    return builtin
+
+
+# Exact types of numbers taking fast paths (bool is int, but not number).
+FAST_NUMBERS = frozenset([int, float])
+
+
+def arithmetic(operation):
+    """Gives primitive fast path for two numbers, applying operation to them
+    right away. Other arguments take the method, which validates them."""
+    def decorate(method):
+        def fast(self, args):
+            if len(args) == 2:
+                (a, b) = args
+                if type(a) in FAST_NUMBERS and type(b) in FAST_NUMBERS:
+                    return operation(a, b)
+
+            return method(self, args)
+
+        fast.__name__ = method.__name__
+        fast.__doc__ = method.__doc__
+        return fast
+
+    return decorate
+
+
+def comparison(operation):
+    """Like arithmetic, for operations returning LISP boolean."""
+    def decorate(method):
+        def fast(self, args):
+            if len(args) == 2:
+                (a, b) = args
+                if type(a) in FAST_NUMBERS and type(b) in FAST_NUMBERS:
+                    return c.V_TRUE if operation(a, b) else c.V_NIL
+
+            return method(self, args)
+
+        fast.__name__ = method.__name__
+        fast.__doc__ = method.__doc__
+        return fast
+
+    return decorate
 
 
 def scope_init(scope):
-    scope.define(c.NIL, c.V_NIL)
-    scope.define(c.TRUE, c.V_TRUE)
+    scope.define(Symbol(c.NIL), c.V_NIL)
+    scope.define(Symbol(c.TRUE), c.V_TRUE)
 
 #    scope.define('abs', abs)
 
@@ -60,9 +276,10 @@ def scope_init(scope):
 
 
 class Interpreter(object):
-    BUILTINS = {
+    # Tables of builtins are keyed by symbols, see lisp.symbols.
+    BUILTINS = symbols({
         'if': 'builtin_if',
-#        'eq': 'builtin_eq',
+        'eq': 'builtin_eq',
         'equal': 'builtin_equal',
         c.LAMBDA: 'builtin_lambda',
         '\\': 'builtin_lambda',
@@ -85,6 +302,24 @@ class Interpreter(object):
         'cdr': 'builtin_cdr',
         'len': 'builtin_len',
 
+        'make-hash': 'builtin_make_hash',
+        'hash-get': 'builtin_hash_get',
+        'hash-set!': 'builtin_hash_set_bang',
+        'hash-remove!': 'builtin_hash_remove_bang',
+        'hash-keys': 'builtin_hash_keys',
+        'hash-count': 'builtin_hash_count',
+
+        'vector': 'builtin_vector',
+        'make-vector': 'builtin_make_vector',
+        'list->vector': 'builtin_list_to_vector',
+        'vector->list': 'builtin_vector_to_list',
+        'vector-ref': 'builtin_vector_ref',
+        'vector-slice': 'builtin_vector_slice',
+        'vector-sum': 'builtin_vector_sum',
+        'vector-dot': 'builtin_vector_dot',
+        'vector-min': 'builtin_vector_min',
+        'vector-max': 'builtin_vector_max',
+
         'call': 'builtin_call',
 
         '=': 'builtin_math_eq',
@@ -101,18 +336,223 @@ class Interpreter(object):
         'min': 'builtin_math_min',
         'max': 'builtin_math_max',
 
+        'macroexpand-1': 'builtin_macroexpand_1',
+        'macroexpand': 'builtin_macroexpand',
+
+        'profile': 'builtin_profile',
+
+        'with-output-to-string': 'builtin_with_output_to_string',
+        'flush': 'builtin_flush',
+
         'begin': 'builtin_begin'
+    })
+
+    # Builtins returning form to be evaluated in tail position.
+    TAIL_BUILTINS = symbols({
+        'if': 'tail_if',
+        'call': 'tail_call',
+        'begin': 'tail_begin'
+    })
+
+    # Functions defined as global variables, overridable by user code.
+    NATIVES = symbols({
+        'map': 'native_map',
+        'filter': 'native_filter',
+        'reverse': 'native_reverse',
+        'head': 'native_head',
+        'tail': 'native_tail',
+        'reduce': 'native_reduce',
+        'fold': 'native_fold',
+        'nth': 'native_nth',
+        'append': 'native_append',
+        'range': 'native_range',
+        'lazy-map': 'native_lazy_map',
+        'lazy-filter': 'native_lazy_filter',
+        'take': 'native_take',
+        'drop': 'native_drop',
+        'iterate': 'native_iterate',
+        'seq->list': 'native_seq_to_list',
+        'vector-map': 'native_vector_map',
+        'pmap': 'native_pmap',
+
+        'memoize': 'native_memoize',
+        'memo-stats': 'native_memo_stats'
+    })
+
+    # Number of results kept by memoized procedure unless told otherwise.
+    MEMOIZE_SIZE = 1024
+
+    # Types of operands of + - * /, which work elementwise on vectors.
+    ARITHMETIC = [c.T_INTEGER, c.T_FLOAT, c.T_VECTOR]
+
+    # Characters of output buffered before being written, see ports.py.
+    OUTPUT_BUFFER = 1 << 16
+
+    # Classes of objects profiler counts as allocations.
+    ALLOCATED = (Pair, Scope, Frame, Procedure, HashMap, vectors.Vector)
+
+    # Types of values natives iterate over, see assert_items.
+    ITEMS = [c.T_LIST, c.T_NIL, c.T_SEQUENCE]
+
+    # Types of values usable as hash map keys.
+    HASH_KEYS = [c.T_SYMBOL, c.T_STRING, c.T_INTEGER, c.T_FLOAT]
+
+    ENGINES = {
+        'tree': 'run_tree',
+        'closure': 'run_closure',
+        'vm': 'run_vm'
     }
 
-    def __init__(self, parser=syntax.parser, scope_init=scope_init):
+    def __init__(self, parser=None, scope_init=scope_init, engine='closure',
+                 optimize=False, output_buffer=OUTPUT_BUFFER):
+        # Parser is optional PLY parser (see syntax.get_parser),
+        # forms are read by reader module if it is None.
+        if engine not in self.ENGINES:
+            raise RuntimeError("Unknown engine '{}'.".format(engine))
+
         self.parser = parser
+        self.engine = engine
+        self.analyzer = analyzer.Analyzer(self)
+        self.vm = vm.VM(self)
+        self.compiler = bytecode.Compiler(self)
+        # Whether forms are rewritten by optimizer before evaluation.
+        self.optimize = optimize
+        self.optimizer = optimizer.Optimizer(self)
+        # Port print writes to, replaced while output is captured.
+        self.output = ports.OutputPort(output_buffer)
+        self.tracer = None
+        self.profiler = None
+        # Macro expansions and quasiquote templates of tree engine, keyed
+        # by id of form, kept until top level form is evaluated.
+        self.expansions = dict()
+        self.templates = dict()
+        # Whether image is being saved, procedures cannot be pickled
+        # otherwise (see Procedure.__getstate__).
+        self.saving_image = False
         self.scope = Scope()
         scope_init(self.scope)
 
-    def interpret(self, code):
-        lisp = self.parser.parse(code)
-#        print(lisp)
-        return self.eval_lisp(lisp, scope=self.scope)
+        for (name, method) in self.NATIVES.items():
+            self.scope.define(name, Native(self, name, getattr(self, method)))
+
+    def set_tracer(self, tracer):
+        # Closure engine wires tracer in during analysis,
+        # so it applies to code analyzed after this call.
+        self.tracer = tracer
+
+    def set_profiler(self, profiler):
+        # Calls of procedures and builtins are reported from now on.
+        if profiler is not None and self.profiler is None:
+            profiling.count(self.ALLOCATED)
+        elif profiler is None and self.profiler is not None:
+            profiling.uncount()
+        self.profiler = profiler
+
+    def profile(self, thunk):
+        """Returns result of thunk, reports its profile unless attached."""
+        if self.profiler is not None:
+            return thunk()
+
+        profiler = profiling.Profiler()
+        self.set_profiler(profiler)
+        try:
+            return thunk()
+        finally:
+            self.set_profiler(None)
+            profiler.close()
+            profiler.report()
+
+    def prepare(self, procedure):
+        """Analyzes body of procedure which has none, e.g. restored one.
+
+        Variables of enclosing lambdas are resolved against names of their
+        frames, like analyzer would do when analyzing enclosing lambda.
+        """
+        env = ()
+        scope = procedure.outer_scope
+        while isinstance(scope, Frame):
+            env += ((scope.names, 0),)
+            scope = scope.outer
+
+        parameters = procedure.parameters
+        names = tuple(parameters)
+        names += tuple(self.analyzer.find_defines(procedure.body, names))
+        env = ((names, len(parameters)),) + env
+
+        if self.engine == 'vm':
+            procedure.code = self.compiler.compile_body(
+                parameters, procedure.body, names, env
+            )
+        else:
+            procedure.code = self.analyzer.analyze(procedure.body, True, env)
+        procedure.names = names
+
+    def read(self, source):
+        """Returns iterator over top level forms of string or file."""
+        if self.parser is None:
+            return reader.read(source)
+
+        if hasattr(source, 'read'):
+            source = source.read()
+
+        return iter([self.parser.parse(source)])
+
+    def interpret(self, source):
+        """Evaluates forms of string or file one by one, returns last value."""
+        value = None
+        forms = self.read(source)
+        if self.optimize:
+            forms = self.optimizer.program(forms)
+
+        for lisp in forms:
+#            print(lisp)
+            value = self.evaluate(lisp)
+
+        return value
+
+    def evaluate(self, lisp):
+        """Evaluates parsed form in global scope."""
+        profiler = self.profiler
+        depth = len(profiler.stack) if profiler is not None else 0
+        try:
+            return self.run(lisp, scope=self.scope)
+        except Exception as e:
+            if self.tracer is not None:
+                self.tracer.error(e)
+            if profiler is not None:
+                # Calls of tree engine and VM ended by error are not
+                # exited by them.
+                profiler.unwind(depth)
+            raise
+        finally:
+            # Entries keep forms they were made for, so they would pile up
+            # with every form evaluated (e.g. in REPL).
+            self.expansions.clear()
+            self.templates.clear()
+            # Output of form precedes anything printed after it.
+            self.output.flush()
+
+    def capture_output(self, thunk):
+        """Runs thunk, returns what it printed as string."""
+        output = self.output
+        self.output = ports.StringPort()
+        try:
+            thunk()
+            return self.output.getvalue()
+        finally:
+            self.output = output
+
+    def run(self, lisp, scope):
+        return getattr(self, self.ENGINES[self.engine])(lisp, scope)
+
+    def run_tree(self, lisp, scope):
+        return self.eval_lisp(lisp, scope)
+
+    def run_closure(self, lisp, scope):
+        return self.analyzer.analyze(lisp)(scope)
+
+    def run_vm(self, lisp, scope):
+        return self.vm.execute(self.compiler.compile(lisp), scope)
 
     def assert_nargs(self, context, args, expected):
         got = len(args)
@@ -176,36 +616,45 @@ class Interpreter(object):
 #
 #        return False
 
-    def builtin_cons(self, scope, args):
-        head = self.eval_lisp(args[0], scope)
-        rest = self.eval_lisp(args[1], scope)
+    @primitive
+    def builtin_cons(self, args):
+        head = args[0]
+        rest = args[1]
 
         if is_nil(head):
-            head = []
+            head = c.V_NIL
 
         if is_nil(rest):
-            rest = []
-
-        if not isinstance(rest, list):
-            rest = [rest]
+            rest = c.V_NIL
+        elif isinstance(rest, list):
+            rest = from_list(rest)
+        elif not isinstance(rest, Pair):
+            rest = Pair(rest, c.V_NIL)
 
-        x = [head] + rest
-        return x
+        return Pair(head, rest)
 
-    def builtin_is_nil(self, scope, args):
-        var = self.eval_lisp(args[0], scope)
+    @primitive
+    def builtin_is_nil(self, args):
+        var = args[0]
 #        print(var.__class__.__name__)
 #        print(is_nil(var))
         return c.V_TRUE if is_nil(var) else c.V_NIL
 
-    def builtin_join(self, scope, args):
-        args = [self.eval_lisp(x, scope) for x in args]
-        return sum(args, [])
+    @primitive
+    def builtin_join(self, args):
+        for i in range(len(args)):
+            self.assert_type_eval("join", args[i], i, [c.T_LIST, c.T_NIL])
 
-    def builtin_list(self, scope, args):
-        return [self.eval_lisp(x, scope) for x in args]
+        return join_lists(args)
+
+    @primitive
+    def builtin_list(self, args):
+        return from_list(args)
 
     def builtin_if(self, scope, args):
+        return self.eval_lisp(self.tail_if(scope, args), scope)
+
+    def tail_if(self, scope, args):
         self.assert_rargs("if", args, 2, 3)
         test_result = self.eval_lisp(args[0], scope)
 #        self.assert_type_eval("if", test_result, 0, c.T_BOOLEAN)
@@ -217,24 +666,25 @@ class Interpreter(object):
         else:
             clause = c.V_NIL
 
-        return self.eval_lisp(clause, scope)
+        return clause
 
-#    def builtin_eq(self, scope, args):
-#        a = self.eval_lisp(args[0], scope)
-#        b = self.eval_lisp(args[0], scope)
-#        print(id(a))
-#        print(id(b))
-#        print(a.__class__.__name__)
-#        return c.V_TRUE if id(a) == id(b) else c.V_NIL
+    @primitive
+    def builtin_eq(self, args):
+        self.assert_nargs("eq", args, 2)
+        (a, b) = args
+        # Identity, except that every empty list is nil.
+        return c.V_TRUE if a is b or (is_nil(a) and is_nil(b)) else c.V_NIL
 
-    def builtin_equal(self, scope, args):
-        a = self.eval_lisp(args[0], scope)
-        b = self.eval_lisp(args[0], scope)
+    @primitive
+    def builtin_equal(self, args):
+        self.assert_nargs("equal", args, 2)
+        (a, b) = args
         return c.V_TRUE if a == b else c.V_NIL
 
-    def builtin_typeof(self, scope, args):
+    @primitive
+    def builtin_typeof(self, args):
         self.assert_nargs("typeof", args, 1)
-        return typeof(self.eval_lisp(args[0], scope))
+        return typeof(args[0])
 
     def builtin_define(self, scope, args):
 #        print(args)
@@ -245,7 +695,7 @@ class Interpreter(object):
 
         self.assert_type_eval("define", name, 0, c.T_SYMBOL)
 
-        scope.define(name, value)
+        scope.define(name, named(value, name))
 
     def builtin_set_bang(self, scope, args):
         self.assert_nargs("set!", args, 2)
@@ -261,7 +711,7 @@ class Interpreter(object):
         return sprintf(args[0], *args[1:])
 
     def builtin_quote(self, scope, args):
-        return args[0]
+        return from_form(args[0])
 
     def builtin_lambda(self, scope, args):
         (parameters, body) = args
@@ -271,69 +721,311 @@ class Interpreter(object):
         (parameters, body) = args
         return Macro(self, parameters, body, scope)
 
+    def find_macro(self, scope, form):
+        """Returns macro called by form, None if form is not macro call."""
+        if not self.is_pair(form) or not is_symbol(form[0]):
+            return None
+
+        try:
+            value = scope.get(form[0])
+        except RuntimeError:
+            return None
+
+        return value if isinstance(value, Macro) else None
+
+    def expand_macro(self, macro, item, cache=True):
+        """Returns expansion of macro call, memoized per call site unless
+        `cache` is false (form built at runtime, e.g. by call)."""
+        if not cache or not is_symbol(item[0]):
+            return macro.expand(item[1:])
+
+        cached = self.expansions.get(id(item))
+        if cached is not None and cached[1] is macro:
+            return cached[2]
+
+        expansion = macro.expand(item[1:])
+        # Form is kept in the entry, so its id cannot be reused.
+        self.expansions[id(item)] = (item, macro, expansion)
+        return expansion
+
+    def builtin_with_output_to_string(self, scope, args):
+        self.assert_nargs("with-output-to-string", args, 1)
+        return self.capture_output(lambda: self.eval_lisp(args[0], scope))
+
+    def builtin_profile(self, scope, args):
+        self.assert_nargs("profile", args, 1)
+        return self.profile(lambda: self.eval_lisp(args[0], scope))
+
+    @scoped_primitive
+    def builtin_macroexpand_1(self, scope, args):
+        self.assert_nargs("macroexpand-1", args, 1)
+        form = to_form(args[0])
+        macro = self.find_macro(scope, form)
+
+        return args[0] if macro is None else from_form(macro.expand(form[1:]))
+
+    @scoped_primitive
+    def builtin_macroexpand(self, scope, args):
+        self.assert_nargs("macroexpand", args, 1)
+        form = to_form(args[0])
+        macro = self.find_macro(scope, form)
+
+        if macro is None:
+            return args[0]
+
+        while macro is not None:
+            form = macro.expand(form[1:])
+            macro = self.find_macro(scope, form)
+
+        return from_form(form)
+
     def is_pair(self, x):
         return x != [] and isinstance(x, list)
 
-    def expand_quasiquote(self, x):
-        if not self.is_pair(x):
-            return [Symbol('quote'), x]
-        elif is_symbol(x[0]) and x[0] == 'unquote':
-            return x[1]
-        else:
-            return [
-                Symbol('cons'),
-                self.expand_quasiquote(x[0]),
-                self.expand_quasiquote(x[1:])
-            ]
+    def template(self, form):
+        """Returns quasiquote template of form, compiled once per form."""
+        cached = self.templates.get(id(form))
+        if cached is not None and cached.form is form:
+            return cached
+
+        # Template keeps the form, so its id cannot be reused.
+        template = quasiquote.Template(form)
+        self.templates[id(form)] = template
+        return template
 
     def builtin_quasiquote(self, scope, args):
-        y = self.expand_quasiquote(args[0])
-        y = self.eval_lisp(y, scope)
-        return y
+        template = self.template(args[0])
+        return template.build([self.eval_lisp(x, scope) for x in template.holes])
 
-    def builtin_print(self, scope, args):
+    @primitive
+    def builtin_print(self, args):
         self.assert_nargs("print", args, 1)
-        obj = self.eval_lisp(args[0], scope=scope)
-        print(to_lisp(obj))
+        write_lisp(args[0], self.output.write)
+        self.output.write("\n")
 
-    def builtin_prin1(self, scope, args):
+    @primitive
+    def builtin_prin1(self, args):
         self.assert_nargs("prin1", args, 1)
-        print(to_lisp(self.eval_lisp(args[0], scope=scope)), end='')
+        write_lisp(args[0], self.output.write)
+
+    @primitive
+    def builtin_flush(self, args):
+        self.assert_nargs("flush", args, 0)
+        self.output.flush()
 
     def builtin_while(self, scope, args):
         (cond, body) = args
         while self.eval_lisp(cond, scope=scope):
             self.eval_lisp(body, scope=scope)
 
-    def builtin_car(self, scope, args):
+    @primitive
+    def builtin_car(self, args):
         self.assert_nargs("car", args, 1)
-        args = self.eval_all(args, scope)
         self.assert_type_eval("car", args[0], 0, c.T_LIST)
 
-        return args[0][0]
+        return args[0].car
 
-    def builtin_cdr(self, scope, args):
+    @primitive
+    def builtin_cdr(self, args):
         self.assert_nargs("cdr", args, 1)
-        args = self.eval_all(args, scope)
         self.assert_type_eval("cdr", args[0], 0, c.T_LIST)
 
-        return args[0][1:]
+        return args[0].cdr
 
-    def builtin_len(self, scope, args):
+    @primitive
+    def builtin_len(self, args):
         self.assert_nargs("len", args, 1)
-        args = self.eval_all(args, scope)
-        self.assert_type_eval("len", args[0], 0, [c.T_LIST, c.T_NIL])
+        self.assert_type_eval(
+            "len", args[0], 0, [c.T_LIST, c.T_NIL, c.T_VECTOR, c.T_SEQUENCE]
+        )
+        self.assert_finite("len", args[0], 0)
 
         return len(args[0])
 
+    @primitive
+    def builtin_make_hash(self, args):
+        self.assert_rargs("make-hash", args, 0, 1)
+        result = HashMap()
+
+        if len(args) == 1:
+            # Initial content as list of (key value) lists.
+            self.assert_type_eval("make-hash", args[0], 0, [c.T_LIST, c.T_NIL])
+            for item in args[0]:
+                if typeof(item) != c.T_LIST or len(item) != 2:
+                    raise RuntimeError(
+                        "make-hash: expected list of (key value) lists."
+                    )
+                (key, value) = item
+                self.assert_type_eval("make-hash", key, 0, self.HASH_KEYS)
+                result.set(key, value)
+
+        return result
+
+    @primitive
+    def builtin_hash_get(self, args):
+        self.assert_rargs("hash-get", args, 2, 3)
+        self.assert_type_eval("hash-get", args[0], 0, c.T_HASH)
+        self.assert_type_eval("hash-get", args[1], 1, self.HASH_KEYS)
+
+        default = args[2] if len(args) == 3 else c.V_NIL
+        return args[0].get(args[1], default)
+
+    @primitive
+    def builtin_hash_set_bang(self, args):
+        self.assert_nargs("hash-set!", args, 3)
+        self.assert_type_eval("hash-set!", args[0], 0, c.T_HASH)
+        self.assert_type_eval("hash-set!", args[1], 1, self.HASH_KEYS)
+
+        args[0].set(args[1], args[2])
+
+    @primitive
+    def builtin_hash_remove_bang(self, args):
+        self.assert_nargs("hash-remove!", args, 2)
+        self.assert_type_eval("hash-remove!", args[0], 0, c.T_HASH)
+        self.assert_type_eval("hash-remove!", args[1], 1, self.HASH_KEYS)
+
+        args[0].remove(args[1])
+
+    @primitive
+    def builtin_hash_keys(self, args):
+        self.assert_nargs("hash-keys", args, 1)
+        self.assert_type_eval("hash-keys", args[0], 0, c.T_HASH)
+
+        return from_list(args[0].keys())
+
+    @primitive
+    def builtin_hash_count(self, args):
+        self.assert_nargs("hash-count", args, 1)
+        self.assert_type_eval("hash-count", args[0], 0, c.T_HASH)
+
+        return len(args[0])
+
+    def assert_items(self, context, value, n, finite=True):
+        """Checks value is list, nil or sequence, finite one unless told
+        otherwise."""
+        self.assert_type_eval(context, value, n, self.ITEMS)
+        if finite:
+            self.assert_finite(context, value, n)
+
+    def assert_finite(self, context, value, n):
+        if is_sequence(value) and not value.finite:
+            raise RuntimeError(
+                "{}: expected {} argument to be finite sequence.".format(
+                    context,
+                    n
+                )
+            )
+
+    def assert_numbers(self, context, items):
+        for x in items:
+            if not is_integer(x) and not is_float(x):
+                raise RuntimeError(
+                    "{}: expected numbers, got {}.".format(context, typeof(x))
+                )
+
+    @primitive
+    def builtin_vector(self, args):
+        self.assert_numbers("vector", args)
+        return vectors.vector(args)
+
+    @primitive
+    def builtin_make_vector(self, args):
+        self.assert_rargs("make-vector", args, 1, 2)
+        self.assert_type_eval("make-vector", args[0], 0, c.T_INTEGER)
+        fill = 0.0
+
+        if len(args) == 2:
+            self.assert_type_eval(
+                "make-vector", args[1], 1, [c.T_INTEGER, c.T_FLOAT]
+            )
+            fill = args[1]
+
+        return vectors.vector([fill] * max(args[0], 0))
+
+    @primitive
+    def builtin_list_to_vector(self, args):
+        self.assert_nargs("list->vector", args, 1)
+        self.assert_items("list->vector", args[0], 0)
+
+        items = list(args[0])
+        self.assert_numbers("list->vector", items)
+        return vectors.vector(items)
+
+    @primitive
+    def builtin_vector_to_list(self, args):
+        self.assert_nargs("vector->list", args, 1)
+        self.assert_type_eval("vector->list", args[0], 0, c.T_VECTOR)
+
+        return from_list(list(args[0]))
+
+    @primitive
+    def builtin_vector_ref(self, args):
+        self.assert_nargs("vector-ref", args, 2)
+        self.assert_type_eval("vector-ref", args[0], 0, c.T_VECTOR)
+        self.assert_type_eval("vector-ref", args[1], 1, c.T_INTEGER)
+
+        if not 0 <= args[1] < len(args[0]):
+            raise RuntimeError(
+                "vector-ref: index {} out of range.".format(args[1])
+            )
+
+        return args[0][args[1]]
+
+    @primitive
+    def builtin_vector_slice(self, args):
+        self.assert_rargs("vector-slice", args, 2, 3)
+        self.assert_type_eval("vector-slice", args[0], 0, c.T_VECTOR)
+        for i in range(1, len(args)):
+            self.assert_type_eval("vector-slice", args[i], i, c.T_INTEGER)
+
+        end = args[2] if len(args) == 3 else len(args[0])
+        return vectors.Vector(args[0].data[args[1]:end])
+
+    @primitive
+    def builtin_vector_sum(self, args):
+        self.assert_nargs("vector-sum", args, 1)
+        self.assert_type_eval("vector-sum", args[0], 0, c.T_VECTOR)
+
+        return vectors.total(args[0])
+
+    @primitive
+    def builtin_vector_dot(self, args):
+        self.assert_nargs("vector-dot", args, 2)
+        self.assert_type_eval("vector-dot", args[0], 0, c.T_VECTOR)
+        self.assert_type_eval("vector-dot", args[1], 1, c.T_VECTOR)
+
+        return vectors.dot(args[0], args[1])
+
+    @primitive
+    def builtin_vector_min(self, args):
+        self.assert_nargs("vector-min", args, 1)
+        self.assert_type_eval("vector-min", args[0], 0, c.T_VECTOR)
+        if len(args[0]) == 0:
+            raise RuntimeError("vector-min: vector is empty.")
+
+        return vectors.minimum(args[0])
+
+    @primitive
+    def builtin_vector_max(self, args):
+        self.assert_nargs("vector-max", args, 1)
+        self.assert_type_eval("vector-max", args[0], 0, c.T_VECTOR)
+        if len(args[0]) == 0:
+            raise RuntimeError("vector-max: vector is empty.")
+
+        return vectors.maximum(args[0])
+
     def builtin_call(self, scope, args):
+        return self.eval_lisp(self.tail_call(scope, args), scope, False)
+
+    def tail_call(self, scope, args):
         name = self.eval_lisp(args[0], scope)
 #        args = self.eval_all(args[1:], scope)
-        return self.eval_lisp([name] + args[1:], scope)
+        return [name] + args[1:]
 
-    def builtin_math_eq(self, scope, args):
-        self.assert_rargs("=", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @comparison(operator.eq)
+    def builtin_math_eq(self, args):
+        self.assert_rargs("=", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval("=", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
@@ -343,9 +1035,10 @@ class Interpreter(object):
 
         return c.V_TRUE
 
-    def builtin_math_lt(self, scope, args):
-        self.assert_rargs("<", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @comparison(operator.lt)
+    def builtin_math_lt(self, args):
+        self.assert_rargs("<", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval("<", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
@@ -355,9 +1048,10 @@ class Interpreter(object):
 
         return c.V_TRUE
 
-    def builtin_math_le(self, scope, args):
-        self.assert_rargs("<=", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @comparison(operator.le)
+    def builtin_math_le(self, args):
+        self.assert_rargs("<=", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval("<=", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
@@ -367,9 +1061,10 @@ class Interpreter(object):
 
         return c.V_TRUE
 
-    def builtin_math_gt(self, scope, args):
-        self.assert_rargs(">", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @comparison(operator.gt)
+    def builtin_math_gt(self, args):
+        self.assert_rargs(">", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval(">", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
@@ -380,9 +1075,10 @@ class Interpreter(object):
 
         return c.V_TRUE
 
-    def builtin_math_ge(self, scope, args):
-        self.assert_rargs(">=", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @comparison(operator.ge)
+    def builtin_math_ge(self, args):
+        self.assert_rargs(">=", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval(">=", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
@@ -392,11 +1088,12 @@ class Interpreter(object):
 
         return c.V_TRUE
 
-    def builtin_math_add(self, scope, args):
-        self.assert_rargs("+", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(operator.add)
+    def builtin_math_add(self, args):
+        self.assert_rargs("+", args, 1, sys.maxsize)
         for i in range(len(args)):
-            self.assert_type_eval("+", args[i], i, [c.T_INTEGER, c.T_FLOAT])
+            self.assert_type_eval("+", args[i], i, self.ARITHMETIC)
 
         result = args[0]
         for x in args[1:]:
@@ -405,11 +1102,12 @@ class Interpreter(object):
         return result
 
 
-    def builtin_math_sub(self, scope, args):
-        self.assert_rargs("-", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(operator.sub)
+    def builtin_math_sub(self, args):
+        self.assert_rargs("-", args, 1, sys.maxsize)
         for i in range(len(args)):
-            self.assert_type_eval("-", args[i], i, [c.T_INTEGER, c.T_FLOAT])
+            self.assert_type_eval("-", args[i], i, self.ARITHMETIC)
 
         result = args[0]
         for x in args[1:]:
@@ -417,11 +1115,12 @@ class Interpreter(object):
 
         return result
 
-    def builtin_math_div(self, scope, args):
-        self.assert_rargs("/", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(operator.truediv)
+    def builtin_math_div(self, args):
+        self.assert_rargs("/", args, 1, sys.maxsize)
         for i in range(len(args)):
-            self.assert_type_eval("/", args[i], i, [c.T_INTEGER, c.T_FLOAT])
+            self.assert_type_eval("/", args[i], i, self.ARITHMETIC)
 
         result = args[0]
         for x in args[1:]:
@@ -429,11 +1128,12 @@ class Interpreter(object):
 
         return result
 
-    def builtin_math_mul(self, scope, args):
-        self.assert_rargs("*", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(operator.mul)
+    def builtin_math_mul(self, args):
+        self.assert_rargs("*", args, 1, sys.maxsize)
         for i in range(len(args)):
-            self.assert_type_eval("*", args[i], i, [c.T_INTEGER, c.T_FLOAT])
+            self.assert_type_eval("*", args[i], i, self.ARITHMETIC)
 
         result = args[0]
         for x in args[1:]:
@@ -441,61 +1141,373 @@ class Interpreter(object):
 
         return result
 
-    def builtin_math_mod(self, scope, args):
+    @primitive
+    @arithmetic(operator.mod)
+    def builtin_math_mod(self, args):
         self.assert_nargs("mod", args, 2)
-        args = self.eval_all(args, scope)
         for i in range(len(args)):
             self.assert_type_eval("mod", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
         return args[0] % args[1]
 
-    def builtin_math_min(self, scope, args):
-        self.assert_rargs("min", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(min)
+    def builtin_math_min(self, args):
+        self.assert_rargs("min", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval("min", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
         return min(args)
 
-    def builtin_math_max(self, scope, args):
-        self.assert_rargs("max", args, 1, sys.maxint)
-        args = self.eval_all(args, scope)
+    @primitive
+    @arithmetic(max)
+    def builtin_math_max(self, args):
+        self.assert_rargs("max", args, 1, sys.maxsize)
         for i in range(len(args)):
             self.assert_type_eval("max", args[i], i, [c.T_INTEGER, c.T_FLOAT])
 
         return max(args)
 
     def builtin_begin(self, scope, args):
+        return self.eval_lisp(self.tail_begin(scope, args), scope)
+
+    def tail_begin(self, scope, args):
+        if len(args) == 0:
+            return c.V_NIL
+
+        for x in args[:-1]:
+            self.eval_lisp(x, scope)
+
+        return args[-1]
+
+    def function(self, context, value):
+        """Returns Python callable calling procedure passed to native."""
+        if is_symbol(value):
+            # Like call, symbol may name builtin or global variable.
+            if value in self.BUILTINS:
+                builtin = getattr(self, self.BUILTINS[value])
+                if not hasattr(builtin, 'primitive'):
+                    raise RuntimeError(
+                        "{}: '{}' cannot be called.".format(context, value)
+                    )
+                return lambda *args: builtin.primitive(self, list(args))
+
+            value = self.scope.get(value)
+
+        if not isinstance(value, Procedure) or isinstance(value, Macro):
+            raise RuntimeError("Not callable")
+
+        return value
+
+    def native_map(self, args):
+        self.assert_nargs("map", args, 2)
+        self.assert_items("map", args[1], 1)
+        function = self.function("map", args[0])
+
+        return from_list([function(x) for x in args[1]])
+
+    def native_filter(self, args):
+        self.assert_nargs("filter", args, 2)
+        self.assert_items("filter", args[1], 1)
+        function = self.function("filter", args[0])
+
+        return from_list([x for x in args[1] if is_true(function(x))])
+
+    def native_reverse(self, args):
+        self.assert_nargs("reverse", args, 1)
+        self.assert_items("reverse", args[0], 0)
+
         result = c.V_NIL
+        for x in args[0]:
+            result = Pair(x, result)
+
+        return result
+
+    def native_head(self, args):
+        self.assert_nargs("head", args, 2)
+        self.assert_type_eval("head", args[0], 0, c.T_INTEGER)
+        self.assert_items("head", args[1], 1, finite=False)
+
+        return from_list(sequences.head(args[1], args[0]))
+
+    def native_tail(self, args):
+        self.assert_nargs("tail", args, 2)
+        self.assert_type_eval("tail", args[0], 0, c.T_INTEGER)
+        self.assert_items("tail", args[1], 1)
+
+        if is_sequence(args[1]):
+            if args[0] <= 0:
+                return c.V_NIL
+            return from_list(list(collections.deque(args[1], args[0])))
+
+        # Last n elements are shared with the list.
+        x = args[1]
+        for _ in range(len(x) - max(args[0], 0)):
+            x = x.cdr
 
-        for x in args:
-            result = self.eval_lisp(x, scope)
+        return x
+
+    def native_reduce(self, args):
+        self.assert_nargs("reduce", args, 2)
+        self.assert_items("reduce", args[1], 1)
+        function = self.function("reduce", args[0])
+
+        # Items of sequences are consumed one by one, never stored.
+        items = iter(args[1])
+        for result in items:
+            break
+        else:
+            return c.V_NIL
+
+        for x in items:
+            result = function(result, x)
+
+        return result
+
+    def native_fold(self, args):
+        self.assert_nargs("fold", args, 3)
+        self.assert_items("fold", args[2], 2)
+        function = self.function("fold", args[0])
+
+        result = args[1]
+        for x in args[2]:
+            result = function(result, x)
 
         return result
 
+    def native_nth(self, args):
+        self.assert_nargs("nth", args, 2)
+        self.assert_type_eval("nth", args[0], 0, c.T_INTEGER)
+        self.assert_items("nth", args[1], 1, finite=False)
+
+        if is_sequence(args[1]):
+            items = sequences.head(sequences.Drop(args[0], args[1]), 1)
+            if args[0] < 0 or len(items) == 0:
+                raise RuntimeError(
+                    "nth: index {} out of range.".format(args[0])
+                )
+            return items[0]
+
+        x = args[1]
+        for _ in range(args[0]):
+            if not isinstance(x, Pair):
+                break
+            x = x.cdr
+
+        if args[0] < 0 or not isinstance(x, Pair):
+            raise RuntimeError("nth: index {} out of range.".format(args[0]))
+
+        return x.car
+
+    def native_append(self, args):
+        for i in range(len(args)):
+            self.assert_items("append", args[i], i)
+
+        return join_lists([
+            from_list(list(x)) if is_sequence(x) else x for x in args
+        ])
+
+    def native_range(self, args):
+        self.assert_rargs("range", args, 1, 3)
+        for i in range(len(args)):
+            self.assert_type_eval("range", args[i], i, c.T_INTEGER)
+
+        if len(args) == 3 and args[2] == 0:
+            raise RuntimeError("range: step cannot be zero.")
+
+        (start, stop, step) = (0, args[0], 1)
+        if len(args) > 1:
+            (start, stop) = args[:2]
+        if len(args) > 2:
+            step = args[2]
+
+        return sequences.Range(start, stop, step)
+
+    def native_lazy_map(self, args):
+        self.assert_nargs("lazy-map", args, 2)
+        self.assert_items("lazy-map", args[1], 1, finite=False)
+        function = self.function("lazy-map", args[0])
+
+        return sequences.Map(function, args[1])
+
+    def native_lazy_filter(self, args):
+        self.assert_nargs("lazy-filter", args, 2)
+        self.assert_items("lazy-filter", args[1], 1, finite=False)
+        function = self.function("lazy-filter", args[0])
+
+        return sequences.Filter(function, args[1])
+
+    def native_take(self, args):
+        self.assert_nargs("take", args, 2)
+        self.assert_type_eval("take", args[0], 0, c.T_INTEGER)
+        self.assert_items("take", args[1], 1, finite=False)
+
+        return sequences.Take(args[0], args[1])
+
+    def native_drop(self, args):
+        self.assert_nargs("drop", args, 2)
+        self.assert_type_eval("drop", args[0], 0, c.T_INTEGER)
+        self.assert_items("drop", args[1], 1, finite=False)
+
+        return sequences.Drop(args[0], args[1])
+
+    def native_iterate(self, args):
+        self.assert_nargs("iterate", args, 2)
+        function = self.function("iterate", args[0])
+
+        return sequences.Iterate(function, args[1])
+
+    def native_seq_to_list(self, args):
+        self.assert_nargs("seq->list", args, 1)
+        self.assert_items("seq->list", args[0], 0)
+
+        return from_list(list(args[0]))
+
+    def native_pmap(self, args):
+        self.assert_rargs("pmap", args, 2, 3)
+        self.assert_items("pmap", args[1], 1)
+        function = self.function("pmap", args[0])
+        workers = multiprocessing.cpu_count()
+
+        if len(args) == 3:
+            self.assert_type_eval("pmap", args[2], 2, c.T_INTEGER)
+            if args[2] < 1:
+                raise RuntimeError("pmap: number of workers must be positive.")
+            workers = args[2]
+
+        def call(x):
+            # Workers exit without flushing buffered output on their own.
+            try:
+                return function(x)
+            finally:
+                self.output.flush()
+
+        # Output buffered so far would be inherited by workers.
+        self.output.flush()
+        return from_list(parallel.pmap(call, list(args[1]), workers))
+
+    def native_vector_map(self, args):
+        self.assert_nargs("vector-map", args, 2)
+        self.assert_type_eval("vector-map", args[1], 1, c.T_VECTOR)
+
+        if is_symbol(args[0]) and args[0].name in vectors.FUNCTIONS:
+            # Math function applied in C loop.
+            try:
+                return vectors.apply(args[0].name, args[1])
+            except (ValueError, OverflowError) as e:
+                raise RuntimeError("vector-map: {}.".format(e))
+
+        function = self.function("vector-map", args[0])
+        items = [function(x) for x in args[1]]
+        self.assert_numbers("vector-map", items)
+        return vectors.vector(items)
+
+    def native_memoize(self, args):
+        self.assert_rargs("memoize", args, 1, 2)
+        self.assert_type_eval("memoize", args[0], 0, c.T_LAMBDA)
+        if isinstance(args[0], Macro):
+            raise RuntimeError("memoize: macro cannot be memoized.")
+
+        size = self.MEMOIZE_SIZE
+        if len(args) == 2:
+            self.assert_type_eval("memoize", args[1], 1, c.T_INTEGER)
+            if args[1] < 1:
+                raise RuntimeError("memoize: size must be positive.")
+            size = args[1]
+
+        return Memoized(self, args[0], size)
+
+    def native_memo_stats(self, args):
+        self.assert_nargs("memo-stats", args, 1)
+        if not isinstance(args[0], Memoized):
+            raise RuntimeError(
+                "memo-stats: expected 0 argument to be memoized procedure."
+            )
+
+        stats = HashMap()
+        stats.set(Symbol('hits'), args[0].hits)
+        stats.set(Symbol('misses'), args[0].misses)
+        stats.set(Symbol('size'), len(args[0].results))
+        stats.set(Symbol('max-size'), args[0].size)
+        return stats
+
     def eval_all(self, args, scope):
         return [self.eval_lisp(x, scope) for x in args]
 
-    def eval_lisp(self, item, scope):
-        print("Running: {}".format(to_lisp(item)))
-        if isinstance(item, syntax.Symbol):
-            return scope.get(item)
-        elif not isinstance(item, list) or len(item) == 0:
-            return item
-        elif item[0] in self.BUILTINS:
-            func = getattr(self, self.BUILTINS[item[0]])
-            return func(scope, item[1:])
-        else:
-            procedure = self.eval_lisp(item[0], scope=scope)
-
-            if isinstance(procedure, Macro):
-                arguments = item[1:]
-                procedure.outer_scope = scope
-                lisp = procedure(*arguments)
-                return self.eval_lisp(lisp, scope)
-            elif isinstance(procedure, Procedure):
-                arguments = [self.eval_lisp(arg, scope=scope) for arg in item[1:]]
-                return procedure(*arguments)
+    def eval_lisp(self, item, scope, cache=True):
+        # Forms in tail position (see TAIL_BUILTINS) and bodies of called
+        # procedures are evaluated by next iteration instead of recursion,
+        # so tail recursive LISP code runs in constant Python stack.
+        # Procedure called that way is reported to profiler as entered
+        # until this call returns (or replaced by next one, in tail call).
+        # `cache` is whether item is part of parsed program, so expansions
+        # of macro calls in it may be memoized (see expand_macro).
+        entered = False
+
+        while True:
+            if self.tracer is not None:
+                self.tracer.trace(item)
+
+            if isinstance(item, Symbol):
+                value = scope.get(item)
+                break
+            elif not isinstance(item, list) or len(item) == 0:
+                value = item
+                break
+            elif is_symbol(item[0]) and item[0] in self.TAIL_BUILTINS:
+                func = getattr(self, self.TAIL_BUILTINS[item[0]])
+                # Form made by call is new on every evaluation.
+                cache = cache and item[0] is not S_CALL
+                item = func(scope, item[1:])
+            elif is_symbol(item[0]) and item[0] in self.BUILTINS:
+                func = getattr(self, self.BUILTINS[item[0]])
+                if self.profiler is not None:
+                    value = self.eval_profiled(item[0], func, scope, item[1:])
+                else:
+                    value = func(scope, item[1:])
+                break
             else:
-                print(item)
-                raise RuntimeError("Not callable")
+                procedure = self.eval_lisp(item[0], scope=scope)
+
+                if isinstance(procedure, Macro):
+                    item = self.expand_macro(procedure, item, cache)
+                elif isinstance(procedure, Procedure):
+                    arguments = [self.eval_lisp(arg, scope=scope) for arg in item[1:]]
+                    if procedure.code is not None:
+                        value = procedure(*arguments)
+                        break
+
+                    if self.profiler is not None:
+                        if entered:
+                            self.profiler.tail(procedure.name)
+                        else:
+                            self.profiler.enter(procedure.name)
+                            entered = True
+
+                    procedure.check_arity(arguments)
+                    scope = Scope(
+                        parameters=procedure.parameters,
+                        arguments=arguments,
+                        outer=procedure.outer_scope
+                    )
+                    item = procedure.body
+                    cache = True
+                else:
+                    print(item)
+                    raise RuntimeError("Not callable")
+
+        if entered and self.profiler is not None:
+            self.profiler.exit()
+
+        return value
+
+    def eval_profiled(self, name, builtin, scope, args):
+        """Evaluates builtin, reporting primitives to profiler."""
+        if hasattr(builtin, 'primitive'):
+            function = profiling.profiled(name, builtin.primitive)
+            return function(self, self.eval_all(args, scope))
+        elif hasattr(builtin, 'scoped_primitive'):
+            function = profiling.profiled(name, builtin.scoped_primitive)
+            return function(self, scope, self.eval_all(args, scope))
+
+        return builtin(scope, args)
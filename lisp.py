@@ -1,5 +1,9 @@
+import collections
 import consts as c
-import interpreter
+import itertools
+import operator
+import sequences
+import vectors
 
 class Qualifier:
     CONST = 1
@@ -42,8 +46,53 @@ class Float(Number):
 class String(LispType):
     pass
 
-class Symbol(LispType):
-    pass
+# Symbol table, maps names to their symbols.
+SYMBOLS = {}
+
+class Symbol(object):
+    """Represents LISP symbol.
+
+    Symbols are interned, Symbol(name) always returns the same object for
+    the same name. They are therefore compared and hashed by identity,
+    which Python does without calling any Python code, e.g. in lookups
+    of variables and builtins. Symbols are never equal to strings.
+    """
+    __slots__ = ('name',)
+
+    def __new__(cls, name):
+        if isinstance(name, Symbol):
+            return name
+
+        symbol = SYMBOLS.get(name)
+        if symbol is None:
+            symbol = object.__new__(cls)
+            symbol.name = name
+            SYMBOLS[name] = symbol
+
+        return symbol
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "Symbol({!r})".format(self.name)
+
+    def __reduce__(self):
+        # Unpickled symbols are interned again.
+        return (Symbol, (self.name,))
+
+def symbols(table):
+    """Returns copy of dict keyed by names, keyed by their symbols."""
+    return dict((Symbol(name), value) for (name, value) in table.items())
+
+# Symbols interpreter refers to on its own.
+S_QUOTE = Symbol(c.QUOTE)
+S_QUASIQUOTE = Symbol(c.QUASIQUOTE)
+S_UNQUOTE = Symbol(c.UNQUOTE)
+S_UNQUOTE_SPLICING = Symbol(c.UNQUOTE_SPLICING)
+S_CONS = Symbol('cons')
+S_DEFINE = Symbol('define')
+S_CALL = Symbol('call')
 
 #class Symbol(str):
 #    """Represents LISP symbol."""
@@ -59,44 +108,381 @@ class Symbol(LispType):
 #    def __ne__(self, other):
 #       return not self.__eq__(other)
 
+class Pair(object):
+    """Represents cons cell, LISP lists are chains of them ending with nil.
+
+    Cells are never modified once built, so lists may share their tails:
+    car, cdr and cons are O(1) and do not copy anything.
+    """
+    __slots__ = ('car', 'cdr')
+
+    def __init__(self, car, cdr):
+        self.car = car
+        self.cdr = cdr
+
+    def __iter__(self):
+        x = self
+        while isinstance(x, Pair):
+            yield x.car
+            x = x.cdr
+
+    def __len__(self):
+        n = 0
+        x = self
+        while isinstance(x, Pair):
+            n += 1
+            x = x.cdr
+        return n
+
+    def __nonzero__(self):
+        # Lists are never empty, unlike their length would suggest to Python.
+        return True
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        a = self
+        b = other
+        while isinstance(a, Pair):
+            if not isinstance(b, Pair) or a.car != b.car:
+                return False
+            a = a.cdr
+            b = b.cdr
+        return a == b
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        # Nil items are unhashable lists, hashed as empty tuples.
+        return hash(tuple(() if is_nil(x) else x for x in self))
+
+    def __str__(self):
+        return to_lisp(self)
+
+    def __repr__(self):
+        return "Pair({!r}, {!r})".format(self.car, self.cdr)
+
+    def __reduce__(self):
+        # Rebuilt from flat list, so pickling long lists does not recurse.
+        return (from_list, (list(self),))
+
+def hash_key(x):
+    """Returns Python dict key of LISP value.
+
+    Keys are tagged by type, so values equal in Python but not in LISP
+    (1, 1.0 and t) do not share one. Lists are keyed by keys of items,
+    nil (unhashable empty list) is keyed as list without them.
+    """
+    kind = type(x)
+    if kind is Pair:
+        return (Pair, tuple(hash_key(i) for i in x))
+    elif kind is list:
+        return (Pair, ())
+    return (kind, x)
+
+class HashMap(object):
+    """Represents LISP hash map of symbols, strings and numbers to values.
+
+    Entries (key, value) are stored under hash_key of key, in order keys
+    were added, so maps are printed the same way on every run.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self):
+        self.data = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self.data.get(hash_key(key))
+        return default if entry is None else entry[1]
+
+    def set(self, key, value):
+        self.data[hash_key(key)] = (key, value)
+
+    def remove(self, key):
+        self.data.pop(hash_key(key), None)
+
+    def keys(self):
+        return [key for (key, _) in self.data.values()]
+
+    def items(self):
+        return list(self.data.values())
+
+    def __len__(self):
+        return len(self.data)
+
+    def __nonzero__(self):
+        # Empty hash map is not nil.
+        return True
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        # Regardless of order of entries.
+        return isinstance(other, HashMap) and \
+            dict(self.data) == dict(other.data)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    # Mutable, cannot be used as key.
+    __hash__ = None
+
+    def __str__(self):
+        return to_lisp(self)
+
+def from_list(items, tail=c.V_NIL):
+    """Returns LISP list of items (Python list), ending with tail."""
+    result = tail
+    for x in reversed(items):
+        result = Pair(x, result)
+    return result
+
+def join_lists(lists):
+    """Returns concatenation of LISP lists, sharing the last one."""
+    if len(lists) == 0:
+        return c.V_NIL
+
+    items = []
+    for x in lists[:-1]:
+        items.extend(x)
+
+    return from_list(items, lists[-1])
+
+def from_form(x):
+    """Converts parsed form (nested Python lists) into LISP data."""
+    if isinstance(x, list):
+        return from_list([from_form(i) for i in x])
+    return x
+
+def to_form(x):
+    """Converts LISP data into form which can be evaluated."""
+    if isinstance(x, Pair):
+        return [to_form(i) for i in x]
+    return x
+
 class Procedure(object):
     """Represents LISP lambda."""
-    def __init__(self, interpreter, parameters, body, outer_scope):
+    def __init__(self, interpreter, parameters, body, outer_scope, code=None,
+                 names=None, name=None):
         self.interpreter = interpreter
         self.parameters = parameters
         self.body = body
         self.outer_scope = outer_scope
+        # Pre-analyzed body (callable taking interpreter.Frame) and names
+        # of its slots (parameters first), if engine provides them.
+        self.code = code
+        self.names = names
+        # Name of variable procedure was defined as, see named().
+        self.name = name
+
+    def __getstate__(self):
+        # Anywhere else (e.g. in results of pmap) interpreter and scopes
+        # procedure refers to would be copied along with it.
+        if not self.interpreter.saving_image:
+            raise TypeError("procedures can be pickled only in images")
+
+        # Pre-analyzed body is not picklable, it is made again when needed
+        # (see Interpreter.prepare). Interpreter is pickled by reference,
+        # see image.py.
+        state = dict(self.__dict__)
+        state['code'] = None
+        state['names'] = None
+        return state
+
+    def check_arity(self, arguments):
+        """Raises unless procedure takes that many arguments."""
+        if len(arguments) != len(self.parameters):
+            raise RuntimeError(
+                "lambda: expected {} argument(s), got {}.".format(
+                    len(self.parameters),
+                    len(arguments)
+                )
+            )
 
     def __call__(self, *arguments):
-        scope = interpreter.Scope(
-            parameters=self.parameters,
-            arguments=arguments,
-            outer=self.outer_scope
-        )
-        return self.interpreter.eval_lisp(self.body, scope)
+        procedure = self
+        profiler = self.interpreter.profiler
+        if profiler is not None:
+            profiler.enter(procedure.name)
+
+        try:
+            # Trampoline: pre-analyzed bodies return TailCall for calls
+            # in tail position, these are run here without growing the stack.
+            while True:
+                if procedure.code is None:
+                    if procedure.interpreter.engine != 'tree':
+                        # Restored from image, analyzed on first call.
+                        procedure.interpreter.prepare(procedure)
+                        continue
+
+                    procedure.check_arity(arguments)
+                    scope = interpreter.Scope(
+                        parameters=procedure.parameters,
+                        arguments=arguments,
+                        outer=procedure.outer_scope
+                    )
+                    result = procedure.interpreter.eval_lisp(
+                        procedure.body, scope
+                    )
+                    break
+
+                names = procedure.names
+                procedure.check_arity(arguments)
+
+                values = list(arguments)
+                if len(names) > len(values):
+                    values.extend(
+                        [interpreter.UNBOUND] * (len(names) - len(values))
+                    )
+
+                result = procedure.code(
+                    interpreter.Frame(names, values, procedure.outer_scope)
+                )
+                if not isinstance(result, TailCall):
+                    break
+
+                procedure = result.procedure
+                arguments = result.arguments
+                if profiler is not None:
+                    profiler.tail(procedure.name)
+        finally:
+            # Also when call fails, so profiler attributes later calls right.
+            if profiler is not None:
+                profiler.exit()
+
+        return result
+
+class TailCall(object):
+    """Represents pending call of procedure in tail position."""
+    __slots__ = ('procedure', 'arguments')
+
+    def __init__(self, procedure, arguments):
+        self.procedure = procedure
+        self.arguments = arguments
+
+def named(value, name):
+    """Names anonymous procedure after variable it is defined as."""
+    if isinstance(value, Procedure) and value.name is None:
+        value.name = name
+    return value
 
 def to_lisp(x):
     """Converts object into LISP representation."""
+    text = atom(x)
+    if text is not None:
+        return text
+
+    chunks = []
+    write_items(x, chunks.append)
+    return ''.join(chunks)
+
+def atom_slow(x):
     if is_symbol(x):
-        return x
+        return x.name
     elif is_string(x):
         return '"{}"'.format(x)
     elif is_integer(x) or is_float(x):
         return str(x)
     elif is_boolean(x):
         return c.TRUE if x else c.NIL
-    elif is_list(x):
-        return "({})".format(" ".join([to_lisp(i) for i in x]))
+    return None
+
+# Representations of atoms by exact type, None for values with items.
+ATOMS = {
+    int: str,
+    float: str,
+    str: '"{}"'.format,
+    Symbol: operator.attrgetter('name'),
+    bool: atom_slow,
+    list: atom_slow,
+    Pair: None,
+    HashMap: None
+}
+
+def atom(x):
+    """Returns LISP representation of object without items, None for others."""
+    function = ATOMS.get(type(x), atom_slow)
+    if function is None:
+        return None
+    return function(x)
+
+def write_lisp(x, write):
+    """Writes LISP representation of object piece by piece."""
+    text = atom(x)
+    if text is None:
+        write_items(x, write)
+    else:
+        write(text)
+
+def write_items(x, write):
+    """Writes LISP representation of object with items (list or other).
+
+    Objects being written are kept on explicit stack instead of Python
+    one, so depth of nesting is not limited. Items without items of their
+    own are written at once, joined.
+    """
+    # [texts of items (None for objects with items), items, position of
+    # next one, closing text] of objects being written.
+    stack = []
+
+    while True:
+        (opening, items, closing) = container(x)
+        items = list(items)
+        texts = [atom(i) for i in items]
+        if None not in texts:
+            write(opening + " ".join(texts) + closing)
+        else:
+            write(opening)
+            stack.append([texts, items, 0, closing])
+
+        while stack:
+            top = stack[-1]
+            (texts, items, start, closing) = top
+            end = start
+            while end < len(texts) and texts[end] is not None:
+                end += 1
+
+            text = " ".join(texts[start:end])
+            if start > 0 and end > start:
+                text = " " + text
+            if end == len(texts):
+                write(text + closing)
+                stack.pop()
+                continue
+
+            if end > 0:
+                text += " "
+            write(text)
+            top[2] = end + 1
+            x = items[end]
+            break
+        else:
+            return
+
+def container(x):
+    """Returns (opening text, items, closing text) of object with items."""
+    if is_list(x):
+        return ('(', x, ')')
+    elif is_hash(x):
+        # Entries are written as lists (key value).
+        return ('#hash(', ([key, value] for (key, value) in x.items()), ')')
+    elif is_vector(x):
+        return ('#vector(', x, ')')
+    elif is_sequence(x):
+        # Only first items are computed, sequence may be infinite.
+        items = list(itertools.islice(x, sequences.PRINT_LIMIT + 1))
+        if len(items) > sequences.PRINT_LIMIT:
+            return ('#sequence(', items[:sequences.PRINT_LIMIT], ' ...)')
+        return ('#sequence(', items, ')')
     elif is_lambda(x):
-        return "({} ({}) {})".format(
+        opening = "({} ({}) ".format(
             c.LAMBDA,
-            " ".join([to_lisp(i) for i in x.parameters]),
-            to_lisp(x.body)
+            " ".join([to_lisp(i) for i in x.parameters])
         )
+        return (opening, [x.body], ')')
     else:
         raise RuntimeError("Unknown type")
-        # HOW IT HAPPENS?!
-#        return c.NIL
 
 def typeof(x):
     """Returns type of LISP object."""
@@ -110,10 +496,18 @@ def typeof(x):
         return c.T_INTEGER
     elif is_float(x):
         return c.T_FLOAT
+    elif isinstance(x, Pair):
+        return c.T_LIST
     elif is_list(x):
         return c.T_LIST if len(x) > 0 else c.T_NIL
     elif is_lambda(x):
         return c.T_LAMBDA
+    elif is_hash(x):
+        return c.T_HASH
+    elif is_vector(x):
+        return c.T_VECTOR
+    elif is_sequence(x):
+        return c.T_SEQUENCE
     else:
         raise RuntimeError("Unknown type")
 
@@ -121,7 +515,7 @@ def is_symbol(x):
     return isinstance(x, Symbol)
 
 def is_string(x):
-    return isinstance(x, str) and not isinstance(x, Symbol)
+    return isinstance(x, str)
 
 def is_integer(x):
     # True/False are integers
@@ -131,13 +525,13 @@ def is_float(x):
     return isinstance(x, float)
 
 def is_boolean(x):
-    return (isinstance(x, bool) and x == True) or x == []
+    return (isinstance(x, bool) and x == True) or is_nil(x)
 
 def is_list(x):
-    return isinstance(x, list)
+    return isinstance(x, (list, Pair))
 
 def is_nil(x):
-    return x == []
+    return isinstance(x, list) and len(x) == 0
 
 def is_true(x):
     return not is_nil(x)
@@ -145,5 +539,17 @@ def is_true(x):
 def is_lambda(x):
     return isinstance(x, Procedure)
 
+def is_hash(x):
+    return isinstance(x, HashMap)
+
+def is_vector(x):
+    return isinstance(x, vectors.Vector)
+
+def is_sequence(x):
+    return isinstance(x, sequences.Sequence)
+
 #if __name__ == '__main__':
 #    print(typeof(1))
+
+# Imported last, interpreter (and reader) need names defined above.
+import interpreter
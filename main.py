@@ -1,30 +1,203 @@
 #!/usr/bin/env python
 
 from interpreter import Interpreter
+import argparse
+import bytecode
+import cache
+import image
+import profiling
+import server
+import tracing
 import sys
 from lisp import *
 
-interpreter = Interpreter()
+arguments = argparse.ArgumentParser(description='LISPer interpreter.')
+arguments.add_argument('script', nargs='?', help='file to run')
+arguments.add_argument(
+    '--engine',
+    choices=sorted(Interpreter.ENGINES),
+    default='closure',
+    help='evaluation engine'
+)
+arguments.add_argument(
+    '--trace',
+    choices=['stderr', 'ring'],
+    help='trace evaluated forms to stderr or keep last ones for errors'
+)
+arguments.add_argument(
+    '--trace-size',
+    type=int,
+    default=100,
+    help='number of forms kept by ring tracer'
+)
+arguments.add_argument(
+    '--trace-every',
+    type=int,
+    default=1,
+    help='trace only every n-th form'
+)
+arguments.add_argument(
+    '--disassemble',
+    action='store_true',
+    help='print bytecode of script instead of running it'
+)
+arguments.add_argument(
+    '-O',
+    dest='optimize',
+    action='store_true',
+    help='optimize forms before evaluating them, see optimizer.py'
+)
+arguments.add_argument(
+    '--dump-optimized',
+    action='store_true',
+    help='print optimized forms of script instead of running it'
+)
+arguments.add_argument(
+    '--output-buffer',
+    type=int,
+    default=Interpreter.OUTPUT_BUFFER,
+    help='characters of output buffered before writing it (0: none)'
+)
+arguments.add_argument(
+    '--profile',
+    action='store_true',
+    help='print time spent and LISP objects allocated in every function '
+         'to stderr'
+)
+arguments.add_argument(
+    '--profile-collapsed',
+    metavar='FILE',
+    help='write profiled call stacks in flamegraph.pl format to file'
+)
+arguments.add_argument(
+    '--no-cache',
+    action='store_true',
+    help='always parse files instead of using cached forms'
+)
+arguments.add_argument(
+    '--cache-dir',
+    default=cache.DEFAULT_DIRECTORY,
+    help='directory of parsed forms cache'
+)
+arguments.add_argument(
+    '--image',
+    help='start from image saved by --save-image instead of stdlib'
+)
+arguments.add_argument(
+    '--save-image',
+    metavar='FILE',
+    help='save global definitions to image after running script'
+)
+arguments.add_argument(
+    '--server',
+    action='store_true',
+    help='evaluate programs read as JSON lines from stdin, see server.py'
+)
+arguments.add_argument(
+    '--workers',
+    type=int,
+    help='number of server processes (default: number of CPUs)'
+)
+options = arguments.parse_args()
 
+if options.disassemble and options.script is None:
+    arguments.error('--disassemble requires script')
+if options.dump_optimized and options.script is None:
+    arguments.error('--dump-optimized requires script')
 
-def run_code(code):
+interpreter = Interpreter(
+    engine=options.engine,
+    optimize=options.optimize,
+    output_buffer=options.output_buffer
+)
+
+if options.trace is not None:
+    if options.trace == 'ring':
+        tracer = tracing.RingBufferTracer(options.trace_size)
+    else:
+        tracer = tracing.StreamTracer()
+
+    if options.trace_every > 1:
+        tracer = tracing.SampledTracer(tracer, options.trace_every)
+
+    interpreter.set_tracer(tracer)
+
+if options.profile or options.profile_collapsed is not None:
+    interpreter.set_profiler(profiling.Profiler())
+
+if options.no_cache:
+    read_file = lambda path: cache.read(interpreter, path)
+else:
+    read_file = cache.ParseCache(interpreter, options.cache_dir).read
+
+if options.disassemble:
+    for lisp in read_file(options.script):
+        print(bytecode.disassemble(interpreter.compiler.compile(lisp)))
+    sys.exit(0)
+
+
+def run_forms(forms):
     try:
-        value = interpreter.interpret(code)
-        if value is not None:
-            print(to_lisp(value))
+        if interpreter.optimize:
+            forms = interpreter.optimizer.program(forms)
+
+        for lisp in forms:
+            value = interpreter.evaluate(lisp)
+            if value is not None:
+                print(to_lisp(value))
     except RuntimeError as e:
         print(e.message)
 
 
-with open('stdlib.lisper', 'r') as handle:
-        code = handle.read()
-        run_code(code)
+if options.image is not None:
+    # Loaded here even for server, so bad image is reported once.
+    try:
+        image.load(interpreter, options.image)
+    except RuntimeError as e:
+        print(e.message)
+        sys.exit(1)
+
+if options.server:
+    stdlib = list(read_file('stdlib.lisper'))
+    server.Server(
+        stdlib,
+        options.engine,
+        options.workers,
+        options.image
+    ).serve(sys.stdin, sys.stdout)
+    sys.exit(0)
+
+if options.image is None:
+    run_forms(read_file('stdlib.lisper'))
+
+if options.dump_optimized:
+    # Optimized in context of stdlib (or image), which is not optimized
+    # unless -O is given as well (then its procedures are never inlined).
+    forms = list(read_file(options.script))
+    interpreter.optimizer.scan(forms)
+    for lisp in forms:
+        print(to_lisp(interpreter.optimizer.optimize(lisp)))
+    sys.exit(0)
+
+if options.script is not None:
+    run_forms(read_file(options.script))
+
+    profiler = interpreter.profiler
+    if profiler is not None:
+        profiler.close()
+        if options.profile:
+            profiler.report()
+        if options.profile_collapsed is not None:
+            with open(options.profile_collapsed, 'w') as handle:
+                profiler.collapsed(handle)
 
-if len(sys.argv) == 2:
-    with open(sys.argv[1], 'r') as handle:
-        code = handle.read()
-        run_code(code)
+    if options.save_image is not None:
+        try:
+            image.save(interpreter, options.save_image)
+        except RuntimeError as e:
+            print(e.message)
+            sys.exit(1)
 else:
     while True:
         code = raw_input('LISPer> ')
-        run_code(code)
+        run_forms(interpreter.read(code))
@@ -0,0 +1,315 @@
+import consts as c
+import interpreter
+from lisp import *
+
+S_SET = Symbol('set!')
+
+
+def is_constant(x):
+    """Returns whether form evaluates to itself."""
+    return is_nil(x) or x is c.V_TRUE or is_integer(x) or is_float(x) or \
+        is_string(x)
+
+
+class Optimizer(object):
+    """Rewrites LISP forms into equivalent ones cheaper to evaluate.
+
+    - calls of pure builtins with constant arguments are folded, e.g.
+      (* 2 3.14), and so is format with constant arguments,
+    - if with constant test is replaced by the branch taken,
+    - nested begin forms are flattened, constants they ignore dropped,
+    - calls of small global procedures (like inc of stdlib) are replaced
+      by their bodies.
+
+    Optimizer relies on what global variables hold when form is optimized:
+    names defined or set! by any program it optimized so far (see scan),
+    e.g. earlier REPL lines or stdlib run with -O, are never inlined, nor
+    treated as constants (t, nil). Arguments of macro calls and quoted
+    data are never changed.
+    """
+    # Builtins without side effects, folded when arguments are constant.
+    PURE = frozenset(Symbol(name) for name in (
+        '+', '-', '*', '/', 'mod', 'min', 'max',
+        '=', '<', '<=', '>', '>=', 'equal', 'null', 'typeof'
+    ))
+
+    # Builtins inlined procedures may consist of (besides global calls).
+    INLINE_BUILTINS = PURE | frozenset(Symbol(name) for name in (
+        'if', 'quote', 'eq', 'car', 'cdr', 'cons', 'list', 'len'
+    ))
+
+    # Forms left as they are.
+    OPAQUE_FORMS = frozenset(Symbol(name) for name in (
+        c.QUOTE, c.QUASIQUOTE, 'call', 'macroexpand-1', 'macroexpand'
+    ))
+
+    # Limits of inlined procedures: number of items of body and depth of
+    # procedures inlined into inlined ones.
+    INLINE_SIZE = 24
+    INLINE_DEPTH = 4
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        # Names defined or set! by programs optimized so far and those of
+        # them which may hold something else than lambda (e.g. macro).
+        # Never reset: code optimized earlier may be called after them.
+        self.defined = set()
+        self.unknown = set()
+
+    def program(self, forms):
+        """Yields optimized forms, each once previous one was evaluated,
+        so it sees definitions made by them."""
+        forms = list(forms)
+        self.scan(forms)
+        for lisp in forms:
+            yield self.optimize(lisp)
+
+    def scan(self, forms):
+        """Records names defined by forms, see class docstring."""
+        pending = list(forms)
+        scope = self.interpreter.scope
+
+        while pending:
+            item = pending.pop()
+            if not isinstance(item, list) or len(item) == 0:
+                continue
+
+            head = item[0]
+            if is_symbol(head) and head in (S_QUOTE, S_QUASIQUOTE):
+                continue
+
+            if head in (S_DEFINE, S_SET) and len(item) == 3 and \
+                    is_symbol(item[1]):
+                self.defined.add(item[1])
+                if not self.is_lambda(item[2]):
+                    self.unknown.add(item[1])
+            elif is_symbol(head) and len(item) > 1 and is_symbol(item[1]) \
+                    and isinstance(scope.data.get(head), interpreter.Macro):
+                # Macro (e.g. def-macro) may define its first argument.
+                self.defined.add(item[1])
+                self.unknown.add(item[1])
+
+            pending.extend(item)
+
+    def is_lambda(self, x):
+        return isinstance(x, list) and len(x) > 0 and is_symbol(x[0]) and \
+            x[0].name in (c.LAMBDA, '\\')
+
+    def optimize(self, item, bound=frozenset(), depth=0):
+        """Returns optimized form, `bound` are variables of enclosing
+        lambdas."""
+        if is_symbol(item):
+            return self.optimize_symbol(item, bound)
+        elif not isinstance(item, list) or len(item) == 0:
+            return item
+
+        head = item[0]
+        if is_symbol(head) and head in self.interpreter.BUILTINS:
+            # Builtins are never shadowed by variables.
+            return self.optimize_builtin(item, bound, depth)
+
+        return self.optimize_call(item, bound, depth)
+
+    def optimize_symbol(self, name, bound):
+        if name in bound or name in self.defined:
+            return name
+
+        value = self.interpreter.scope.data.get(name)
+        if name.name in (c.TRUE, c.NIL) and is_constant(value):
+            return value
+
+        return name
+
+    def optimize_builtin(self, item, bound, depth):
+        head = item[0]
+        name = head.name
+        args = item[1:]
+
+        if head in self.OPAQUE_FORMS:
+            return item
+        elif name in (c.LAMBDA, '\\', 'macro'):
+            if len(args) != 2 or not isinstance(args[0], list):
+                return item
+            inner = bound | frozenset(args[0])
+            return [head, args[0], self.optimize(args[1], inner, depth)]
+        elif name in ('define', 'set!'):
+            if len(args) != 2:
+                return item
+            return [head, args[0], self.optimize(args[1], bound, depth)]
+        elif name == 'if':
+            return self.optimize_if(item, bound, depth)
+        elif name == 'begin':
+            return self.optimize_begin(item, bound, depth)
+        elif name == 'format':
+            return self.fold_format(item)
+
+        args = [self.optimize(x, bound, depth) for x in args]
+        if head in self.PURE and all(is_constant(x) for x in args):
+            return self.fold(head, args)
+
+        return [head] + args
+
+    def optimize_if(self, item, bound, depth):
+        if len(item) not in (3, 4):
+            return item
+
+        test = self.optimize(item[1], bound, depth)
+        branches = item[2:]
+        if is_constant(test):
+            if is_true(test):
+                return self.optimize(branches[0], bound, depth)
+            elif len(branches) == 2:
+                return self.optimize(branches[1], bound, depth)
+            return c.V_NIL
+
+        return [item[0], test] + [
+            self.optimize(x, bound, depth) for x in branches
+        ]
+
+    def optimize_begin(self, item, bound, depth):
+        body = []
+        pending = list(reversed(item[1:]))
+
+        while pending:
+            x = self.optimize(pending.pop(), bound, depth)
+            if isinstance(x, list) and len(x) > 0 and x[0] is item[0]:
+                # Nested begin, its forms are optimized already.
+                body.extend(x[1:])
+            else:
+                body.append(x)
+
+        # Constants not being value of begin are dropped.
+        body = [x for x in body[:-1] if not is_constant(x)] + body[-1:]
+
+        if len(body) == 0:
+            return c.V_NIL
+        elif len(body) == 1:
+            return body[0]
+        return [item[0]] + body
+
+    def fold(self, head, args):
+        """Returns value of pure builtin call, the call if it fails."""
+        interp = self.interpreter
+        builtin = getattr(interp, interp.BUILTINS[head])
+
+        try:
+            value = builtin.primitive(interp, list(args))
+        except Exception:
+            # Error is left to be raised when the call is evaluated.
+            return [head] + args
+
+        return value if is_constant(value) else [head] + args
+
+    def fold_format(self, item):
+        # Format does not evaluate its arguments.
+        args = item[1:]
+        if len(args) == 0 or not all(is_constant(x) for x in args):
+            return item
+
+        try:
+            return interpreter.sprintf(args[0], *args[1:])
+        except Exception:
+            return item
+
+    def optimize_call(self, item, bound, depth):
+        head = item[0]
+
+        if isinstance(head, list):
+            if not self.is_lambda(head):
+                # Value of head is not known, it may be macro.
+                return [self.optimize(head, bound, depth)] + item[1:]
+            head = self.optimize(head, bound, depth)
+        elif not is_symbol(head):
+            return item
+        elif head in self.defined:
+            if head in self.unknown:
+                return item
+        elif head not in bound:
+            value = self.interpreter.scope.data.get(head)
+            if not isinstance(value, Procedure) or \
+                    isinstance(value, interpreter.Macro):
+                return item
+
+            args = [self.optimize(x, bound, depth) for x in item[1:]]
+            body = self.inline(value, args, bound)
+            if body is not None and depth < self.INLINE_DEPTH:
+                return self.optimize(body, bound, depth + 1)
+            return [head] + args
+
+        return [head] + [self.optimize(x, bound, depth) for x in item[1:]]
+
+    def inline(self, procedure, args, bound):
+        """Returns body of procedure with parameters replaced by args,
+        None if the call cannot be replaced by it."""
+        parameters = list(procedure.parameters)
+        if type(procedure) is not Procedure or \
+                procedure.outer_scope is not self.interpreter.scope or \
+                len(parameters) != len(args):
+            return None
+
+        # Parameters in order of evaluation, None for global calls.
+        uses = []
+        if not self.inlinable(procedure, procedure.body, parameters, bound,
+                              uses, True):
+            return None
+
+        if not all(is_constant(x) or is_symbol(x) for x in args):
+            # Arguments are evaluated once, in order, before the body.
+            if uses != parameters:
+                return None
+
+        return self.substitute(procedure.body, dict(zip(parameters, args)))
+
+    def inlinable(self, procedure, x, parameters, bound, uses, evaluated):
+        """Returns whether body of procedure consists of builtins, global
+        calls and variables looked up the same way at the call site.
+        `evaluated` is whether x is evaluated every time body is."""
+        if is_symbol(x):
+            if x in parameters:
+                uses.append(x if evaluated else None)
+                return True
+            return x not in bound and x not in self.defined and \
+                x is not procedure.name
+        elif not isinstance(x, list) or len(x) == 0:
+            return True
+        elif self.size(x) > self.INLINE_SIZE:
+            return False
+
+        head = x[0]
+        if not is_symbol(head):
+            return False
+        elif head in self.interpreter.BUILTINS:
+            if head not in self.INLINE_BUILTINS:
+                return False
+            elif head is S_QUOTE:
+                return True
+        elif not self.inlinable(procedure, head, parameters, bound, uses,
+                                evaluated):
+            return False
+        else:
+            # Global procedure may have side effects.
+            uses.append(None)
+
+        if head.name == 'if':
+            return len(x) in (3, 4) and \
+                self.inlinable(procedure, x[1], parameters, bound, uses,
+                               evaluated) and \
+                all(self.inlinable(procedure, y, parameters, bound, uses,
+                                   False) for y in x[2:])
+
+        return all(
+            self.inlinable(procedure, y, parameters, bound, uses, evaluated)
+            for y in x[1:]
+        )
+
+    def size(self, x):
+        if not isinstance(x, list):
+            return 1
+        return sum(self.size(y) for y in x)
+
+    def substitute(self, x, values):
+        if is_symbol(x):
+            return values.get(x, x)
+        elif not isinstance(x, list) or len(x) == 0 or x[0] is S_QUOTE:
+            return x
+        return [self.substitute(y, values) for y in x]
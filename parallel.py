@@ -0,0 +1,84 @@
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+
+# Procedure applied by workers and its items, set before they are forked.
+_function = None
+_items = None
+# Whether this process is pool worker, workers cannot start pools.
+_worker = False
+
+
+def start_worker():
+    global _worker
+    _worker = True
+
+
+def call(index):
+    return _function(_items[index])
+
+
+def make_pool(workers):
+    """Returns pool of forked processes, None if platform cannot fork."""
+    if hasattr(multiprocessing, 'get_context'):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return None
+        return multiprocessing.get_context('fork').Pool(workers, start_worker)
+
+    if not hasattr(os, 'fork'):
+        return None
+    return multiprocessing.Pool(workers, start_worker)
+
+
+def pmap(function, items, workers):
+    """Returns list of function applied to items, computed in parallel.
+
+    Workers are forked when called, so they inherit the interpreter with
+    all its definitions and the items (which may be anything, procedure
+    may be any closure). Only indices of items and results travel between
+    processes, results must be picklable, i.e. cannot contain procedures.
+    Indices are sent in chunks, results come back in order. Errors raised
+    by function are raised again here.
+
+    Runs serially where processes cannot be forked and in workers.
+    """
+    global _function, _items
+
+    workers = min(workers, len(items))
+    if _worker or workers < 2:
+        return [function(x) for x in items]
+
+    # Output buffered so far would be written by every worker as well.
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    # Kept while pool runs, workers replacing dead ones need it as well.
+    _function = function
+    _items = items
+    try:
+        pool = make_pool(workers)
+        if pool is None:
+            return [function(x) for x in items]
+
+        chunk = max(1, len(items) // (workers * 4))
+        try:
+            results = pool.map(call, range(len(items)), chunk)
+        except multiprocessing.pool.MaybeEncodingError:
+            pool.terminate()
+            raise RuntimeError(
+                "pmap: results cannot contain procedures or macros."
+            )
+        except BaseException:
+            pool.terminate()
+            raise
+        else:
+            # Workers exit on their own, flushing their output.
+            pool.close()
+        finally:
+            pool.join()
+    finally:
+        _function = None
+        _items = None
+
+    return results
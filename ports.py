@@ -0,0 +1,46 @@
+import sys
+
+
+class OutputPort(object):
+    """Buffers text printed by LISP code, writing it out in large chunks.
+
+    Buffer is written once it holds `size` characters (0: on every write),
+    on flush() and, by interpreter, after every top level form, so output
+    of Python code is not interleaved with it. Stream is sys.stdout,
+    looked up on every flush so it may be replaced, unless given.
+    """
+    def __init__(self, size, stream=None):
+        self.size = size
+        self.stream = stream
+        self.chunks = []
+        self.length = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if not self.chunks:
+            return
+
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(''.join(self.chunks))
+        self.chunks = []
+        self.length = 0
+
+
+class StringPort(OutputPort):
+    """Collects text printed by LISP code, see Interpreter.capture_output."""
+    def __init__(self):
+        OutputPort.__init__(self, None)
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self.chunks)
@@ -0,0 +1,169 @@
+from __future__ import print_function
+import sys
+import timeit
+
+# Number of objects of classes passed to count() created so far.
+allocations = [0]
+# Classes counted and their own __init__, see count().
+_counted = []
+_counting = [0]
+
+
+def count(classes):
+    """Counts objects of classes in `allocations` until uncount() is
+    called as many times as count() was. Their __init__ is replaced
+    meanwhile, so objects are not counted (nor slowed down) otherwise."""
+    _counting[0] += 1
+    if _counting[0] > 1:
+        return
+
+    for cls in classes:
+        init = cls.__dict__['__init__']
+        cls.__init__ = counting(init)
+        _counted.append((cls, init))
+
+
+def counting(init):
+    def __init__(self, *args, **kwargs):
+        allocations[0] += 1
+        init(self, *args, **kwargs)
+
+    return __init__
+
+
+def uncount():
+    _counting[0] -= 1
+    if _counting[0] > 0:
+        return
+
+    while _counted:
+        (cls, init) = _counted.pop()
+        cls.__init__ = init
+
+
+class Stats(object):
+    """Totals of one function, times are in seconds."""
+    __slots__ = ('calls', 'inclusive', 'exclusive', 'allocations')
+
+    def __init__(self):
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.allocations = 0
+
+
+class Profiler(object):
+    """Attributes time spent in LISP procedures and builtins.
+
+    Engines report calls with enter() and exit(), tail calls with tail(),
+    which replaces the caller. Procedures are named by variable they were
+    defined as (anonymous ones are "lambda"), builtins by their symbol.
+
+    Inclusive time of recursive function is counted once, for its
+    outermost call. Allocations are LISP objects (see count(), engines
+    count list cells, scopes and frames, procedures, hash maps and
+    vectors) created by function itself.
+    """
+    def __init__(self, clock=timeit.default_timer):
+        self.clock = clock
+        self.functions = {}
+        # Exclusive time of every call stack, keyed by names joined by ';'.
+        self.stacks = {}
+        # Entries: [path, name, start, time of children, allocations,
+        # allocations of children].
+        self.stack = []
+        self.active = {}
+
+    def enter(self, name):
+        name = 'lambda' if name is None else str(name)
+
+        if self.stack:
+            path = self.stack[-1][0] + ';' + name
+        else:
+            path = name
+
+        self.active[name] = self.active.get(name, 0) + 1
+        self.stack.append(
+            [path, name, self.clock(), 0.0, allocations[0], 0]
+        )
+
+    def exit(self):
+        if not self.stack:
+            return
+
+        (path, name, start, children, allocated, child_allocated) = \
+            self.stack.pop()
+        elapsed = self.clock() - start
+        allocated = allocations[0] - allocated
+
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = Stats()
+
+        self.active[name] -= 1
+        stats.calls += 1
+        if self.active[name] == 0:
+            stats.inclusive += elapsed
+        stats.exclusive += elapsed - children
+        stats.allocations += allocated - child_allocated
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - children
+
+        if self.stack:
+            self.stack[-1][3] += elapsed
+            self.stack[-1][5] += allocated
+
+    def tail(self, name):
+        self.exit()
+        self.enter(name)
+
+    def unwind(self, depth):
+        """Ends calls above `depth` which did not return, e.g. because of
+        error."""
+        while len(self.stack) > depth:
+            self.exit()
+
+    def close(self):
+        self.unwind(0)
+
+    def report(self, stream=None, limit=None):
+        """Writes table of functions, most expensive (exclusive time) first."""
+        stream = sys.stderr if stream is None else stream
+        functions = sorted(
+            self.functions.items(),
+            key=lambda item: (-item[1].exclusive, item[0])
+        )
+
+        stream.write("{:>10} {:>12} {:>12} {:>12}  {}\n".format(
+            "calls", "inclusive", "exclusive", "allocations", "function"
+        ))
+        for (name, stats) in functions[:limit]:
+            stream.write("{:10} {:11.6f}s {:11.6f}s {:12}  {}\n".format(
+                stats.calls,
+                stats.inclusive,
+                stats.exclusive,
+                stats.allocations,
+                name
+            ))
+
+    def collapsed(self, stream):
+        """Writes stacks in collapsed format of flamegraph.pl (microseconds)."""
+        for path in sorted(self.stacks):
+            value = int(round(self.stacks[path] * 1e6))
+            if value > 0:
+                stream.write("{} {}\n".format(path, value))
+
+
+def profiled(name, function):
+    """Returns builtin function whose calls are reported to profiler."""
+    def call(interpreter, *args):
+        profiler = interpreter.profiler
+        if profiler is None:
+            return function(interpreter, *args)
+
+        profiler.enter(name)
+        try:
+            return function(interpreter, *args)
+        finally:
+            profiler.exit()
+
+    return call
@@ -0,0 +1,113 @@
+import consts as c
+from lisp import *
+
+# Kinds of list items of template.
+VALUE = 0
+HOLE = 1
+SPLICE = 2
+PART = 3
+
+
+def splice(value):
+    """Returns items of list spliced into template."""
+    if isinstance(value, Pair) or is_nil(value):
+        return value
+    raise RuntimeError(
+        "{}: expected list, got {}.".format(c.UNQUOTE_SPLICING, typeof(value))
+    )
+
+
+def rest(value):
+    """Returns list whose tail is unquoted value, like cons would."""
+    if is_nil(value):
+        return c.V_NIL
+    elif isinstance(value, list):
+        return from_list(value)
+    elif not isinstance(value, Pair):
+        return Pair(value, c.V_NIL)
+    return value
+
+
+class Template(object):
+    """Quasiquoted form compiled into builder of its values.
+
+    Unquoted forms ("holes") are evaluated by engine, in order they appear
+    in template, and build() assembles value out of their values. Parts of
+    template without holes are converted into LISP data once and shared
+    by all values (lists are never modified), lists spliced at their end
+    are shared as well.
+    """
+    def __init__(self, form):
+        self.form = form
+        self.holes = []
+        (static, value) = self.compile(form)
+        if static:
+            self.build = lambda values: value
+        else:
+            self.build = value
+
+    def hole(self, form):
+        self.holes.append(form)
+        return len(self.holes) - 1
+
+    def compile(self, x):
+        """Returns (True, value) for x without holes, (False, function
+        building value out of values of holes) otherwise."""
+        if not isinstance(x, list) or len(x) == 0:
+            return (True, from_form(x))
+        elif x[0] is S_UNQUOTE:
+            index = self.hole(x[1])
+            return (False, lambda values: values[index])
+        elif x[0] is S_UNQUOTE_SPLICING:
+            raise RuntimeError(
+                "{}: not in list.".format(c.UNQUOTE_SPLICING)
+            )
+
+        items = []
+        tail = None
+        for (i, y) in enumerate(x):
+            if i > 0 and y is S_UNQUOTE and i == len(x) - 2:
+                # (a unquote b), i.e. b is cdr.
+                tail = (HOLE, self.hole(x[i + 1]))
+                break
+            elif isinstance(y, list) and len(y) > 0 and y[0] is S_UNQUOTE:
+                items.append((HOLE, self.hole(y[1])))
+                continue
+            elif isinstance(y, list) and len(y) > 0 and \
+                    y[0] is S_UNQUOTE_SPLICING:
+                items.append((SPLICE, self.hole(y[1])))
+                continue
+
+            (static, value) = self.compile(y)
+            items.append((VALUE, value) if static else (PART, value))
+
+        # Items without holes at the end are built once, as tail.
+        suffix = []
+        while items and items[-1][0] == VALUE and tail is None:
+            suffix.append(items.pop()[1])
+        constant = from_list(list(reversed(suffix)))
+
+        if tail is None and len(items) == 0:
+            return (True, constant)
+        elif tail is None and constant is c.V_NIL and items[-1][0] == SPLICE:
+            tail = items.pop()
+
+        def build(values):
+            result = []
+            for (kind, x) in items:
+                if kind == HOLE:
+                    result.append(values[x])
+                elif kind == VALUE:
+                    result.append(x)
+                elif kind == PART:
+                    result.append(x(values))
+                else:
+                    result.extend(splice(values[x]))
+
+            if tail is None:
+                return from_list(result, constant)
+            elif tail[0] == SPLICE:
+                return from_list(result, splice(values[tail[1]]))
+            return from_list(result, rest(values[tail[1]]))
+
+        return (False, build)
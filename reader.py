@@ -0,0 +1,121 @@
+import re
+from lisp import *
+
+# Same tokens as syntax.py, tried in the same order.
+TOKENS = re.compile('|'.join([
+    r'(?P<space>\s+)',
+    r'(?P<number>[-+]?[0-9]*\.?[0-9]+)',
+    r'(?P<string>\"([^\\\n]|(\\.))*?\")',
+    r'(?P<symbol>[^\s\(\)\'`,]+)',
+    r'(?P<punctuation>,@|[\(\)\'`,])'
+]))
+
+PREFIXES = {
+    "'": S_QUOTE,
+    '`': S_QUASIQUOTE,
+    ',': S_UNQUOTE,
+    ',@': S_UNQUOTE_SPLICING
+}
+
+
+class Form(list):
+    """List read from source, remembers where it started (1-based)."""
+    __slots__ = ('line', 'column')
+
+    def __init__(self, items, line, column):
+        list.__init__(self, items)
+        self.line = line
+        self.column = column
+
+
+class Prefix(object):
+    """Quote-like prefix waiting for form it applies to."""
+    __slots__ = ('symbol', 'line', 'column')
+
+    def __init__(self, symbol, line, column):
+        self.symbol = symbol
+        self.line = line
+        self.column = column
+
+
+def lines(source):
+    """Yields lines of string or file object, keeping line ends."""
+    if hasattr(source, 'read'):
+        for line in source:
+            yield line
+        return
+
+    start = 0
+    while start < len(source):
+        end = source.find('\n', start) + 1
+        if end == 0:
+            end = len(source)
+        yield source[start:end]
+        start = end
+
+
+def tokens(source):
+    """Yields (kind, text, line, column) of tokens, kind is regex group.
+
+    Tokens never span lines, so source is read line by line.
+    """
+    for (number, line) in enumerate(lines(source), 1):
+        position = 0
+        while position < len(line):
+            match = TOKENS.match(line, position)
+            kind = match.lastgroup
+            if kind != 'space':
+                yield (kind, match.group(kind), number, position + 1)
+            position = match.end()
+
+
+def atom(kind, text):
+    if kind == 'number':
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    elif kind == 'string':
+        return text[1:-1]
+    else:
+        return Symbol(text)
+
+
+def read(source):
+    """Yields top level forms of string or file object one by one.
+
+    Nesting is tracked on explicit stack of open lists and pending
+    prefixes, so depth of forms is not limited by Python stack.
+    """
+    stack = []
+
+    for (kind, text, line, column) in tokens(source):
+        if kind != 'punctuation':
+            value = atom(kind, text)
+        elif text == '(':
+            stack.append(Form([], line, column))
+            continue
+        elif text in PREFIXES:
+            stack.append(Prefix(PREFIXES[text], line, column))
+            continue
+        elif stack and isinstance(stack[-1], Form):
+            value = stack.pop()
+        else:
+            raise RuntimeError(
+                "Unexpected ')' at line {}, column {}.".format(line, column)
+            )
+
+        while stack and isinstance(stack[-1], Prefix):
+            prefix = stack.pop()
+            value = Form([prefix.symbol, value], prefix.line, prefix.column)
+
+        if stack:
+            stack[-1].append(value)
+        else:
+            yield value
+
+    if stack:
+        raise RuntimeError(
+            "Unexpected end of input, form started at line {}, column {} "
+            "is not finished.".format(stack[-1].line, stack[-1].column)
+        )
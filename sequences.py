@@ -0,0 +1,121 @@
+import itertools
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+# Number of items printed, longer sequences are printed with "...".
+PRINT_LIMIT = 10
+
+
+class Sequence(object):
+    """Represents lazy LISP sequence.
+
+    Items are computed one by one every time sequence is iterated, none of
+    them is stored, so sequences may be iterated many times and even be
+    infinite. Procedures applied to items are called again on every pass.
+    """
+    finite = True
+
+    def __iter__(self):
+        raise NotImplementedError()
+
+    def __len__(self):
+        # Counted without keeping items.
+        n = 0
+        for _ in self:
+            n += 1
+        return n
+
+    def __nonzero__(self):
+        # Empty sequence is not nil.
+        return True
+
+    __bool__ = __nonzero__
+
+
+class Range(Sequence):
+    def __init__(self, start, stop, step):
+        self.start = start
+        self.stop = stop
+        self.step = step
+
+    def __iter__(self):
+        return iter(xrange(self.start, self.stop, self.step))
+
+    def __len__(self):
+        if self.step > 0:
+            n = (self.stop - self.start + self.step - 1) // self.step
+        else:
+            n = (self.start - self.stop - self.step - 1) // -self.step
+        return max(n, 0)
+
+
+class Map(Sequence):
+    def __init__(self, function, items):
+        self.function = function
+        self.items = items
+        self.finite = getattr(items, 'finite', True)
+
+    def __iter__(self):
+        function = self.function
+        for x in self.items:
+            yield function(x)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Filter(Sequence):
+    def __init__(self, function, items):
+        self.function = function
+        self.items = items
+        self.finite = getattr(items, 'finite', True)
+
+    def __iter__(self):
+        function = self.function
+        for x in self.items:
+            value = function(x)
+            # Anything but nil passes.
+            if not isinstance(value, list) or len(value) > 0:
+                yield x
+
+
+class Take(Sequence):
+    def __init__(self, n, items):
+        self.n = max(n, 0)
+        self.items = items
+
+    def __iter__(self):
+        return itertools.islice(self.items, self.n)
+
+
+class Drop(Sequence):
+    def __init__(self, n, items):
+        self.n = max(n, 0)
+        self.items = items
+        self.finite = getattr(items, 'finite', True)
+
+    def __iter__(self):
+        return itertools.islice(self.items, self.n, None)
+
+
+class Iterate(Sequence):
+    """Infinite sequence of x, f(x), f(f(x)), ..."""
+    finite = False
+
+    def __init__(self, function, start):
+        self.function = function
+        self.start = start
+
+    def __iter__(self):
+        (function, x) = (self.function, self.start)
+        while True:
+            yield x
+            x = function(x)
+
+
+def head(items, n):
+    """Returns list of first n items of list or sequence."""
+    return list(itertools.islice(items, max(n, 0)))
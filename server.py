@@ -0,0 +1,170 @@
+import collections
+import json
+import multiprocessing
+import sys
+import threading
+import timeit
+import image
+import parallel
+from interpreter import Interpreter, Memoized
+from lisp import *
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+# Interpreter of worker process and its global scope with stdlib loaded.
+_interpreter = None
+_globals = None
+
+
+def start(engine, stdlib, path):
+    """Initializes worker process, evaluating stdlib forms once
+    (or loading image from path, if given)."""
+    global _interpreter, _globals
+
+    parallel.start_worker()
+    _interpreter = Interpreter(engine=engine)
+    if path is not None:
+        image.load(_interpreter, path)
+    else:
+        for lisp in stdlib:
+            _interpreter.evaluate(lisp)
+    _globals = _interpreter.scope
+
+
+def isolated(data):
+    """Returns copy of global variables for one request.
+
+    Values modified in place (hash maps and results of memoized
+    procedures) are copied as well, also when held by lists or hash maps;
+    value of several variables stays shared by them. Values reachable only
+    from procedures (variables of enclosing lambdas) are not copied.
+    Vectors are never modified.
+    """
+    copies = {}
+    return dict(
+        (name, isolate(value, copies)) for (name, value) in data.items()
+    )
+
+
+def isolate(value, copies):
+    if isinstance(value, Pair):
+        items = list(value)
+        copied = [isolate(x, copies) for x in items]
+        if all(x is y for (x, y) in zip(items, copied)):
+            return value
+        return from_list(copied)
+    elif not isinstance(value, (HashMap, Memoized)):
+        return value
+    elif id(value) in copies:
+        return copies[id(value)]
+
+    if isinstance(value, HashMap):
+        result = copies[id(value)] = HashMap()
+        for (key, x) in value.items():
+            result.set(key, isolate(x, copies))
+        return result
+
+    result = copies[id(value)] = Memoized(
+        value.interpreter, value.procedure, value.size
+    )
+    result.name = value.name
+    result.results = collections.OrderedDict(
+        (key, isolate(x, copies)) for (key, x) in value.results.items()
+    )
+    (result.hits, result.misses) = (value.hits, value.misses)
+    return result
+
+
+def run(program):
+    """Evaluates program in copy of global variables, returns response."""
+    if not isinstance(program, str):
+        program = program.encode('utf-8')
+
+    response = {'value': None, 'output': '', 'error': None}
+    output = StringIO()
+    stdout = sys.stdout
+    start = timeit.default_timer()
+
+    # Definitions and changes of one request are not seen by others.
+    # Procedures defined by stdlib live in global scope, so its variables
+    # are replaced, not the scope.
+    variables = _globals.data
+    _globals.data = isolated(variables)
+    sys.stdout = output
+    try:
+        value = _interpreter.interpret(program)
+        if value is not None:
+            response['value'] = to_lisp(value)
+    except Exception as e:
+        response['error'] = str(e)
+    finally:
+        sys.stdout = stdout
+        _interpreter.scope = _globals
+        _globals.data = variables
+        _interpreter.expansions.clear()
+        _interpreter.templates.clear()
+
+    response['output'] = output.getvalue()
+    response['elapsed'] = timeit.default_timer() - start
+    return response
+
+
+class Server(object):
+    """Evaluates programs read as JSON lines, using pool of processes.
+
+    Every request is object with "program" (source code) and optional
+    "id", which is copied into response. Responses are written as JSON
+    lines in order they are finished, with "value" of the last form (or
+    null), printed "output", "error" message (or null), "elapsed" seconds
+    of evaluation and "latency" seconds since the request was read.
+    """
+    def __init__(self, stdlib, engine='closure', workers=None, image=None):
+        self.pool = multiprocessing.Pool(
+            workers,
+            start,
+            (engine, stdlib, image)
+        )
+        self.lock = threading.Lock()
+
+    def write(self, stream, response):
+        with self.lock:
+            stream.write(json.dumps(response, sort_keys=True) + "\n")
+            stream.flush()
+
+    def submit(self, stream, line):
+        received = timeit.default_timer()
+
+        identifier = None
+        try:
+            request = json.loads(line)
+            identifier = request.get('id')
+            program = request['program']
+            if not isinstance(program, type(u'')):
+                raise TypeError("program is not string")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.write(stream, {
+                'id': identifier,
+                'error': "Invalid request: {}".format(line.strip())
+            })
+            return
+
+        def done(response):
+            response['id'] = identifier
+            response['latency'] = timeit.default_timer() - received
+            self.write(stream, response)
+
+        self.pool.apply_async(run, (program,), callback=done)
+
+    def serve(self, input, output):
+        """Serves requests until end of input, waits for their responses."""
+        try:
+            # Read line by line, so requests are not held in read-ahead.
+            for line in iter(input.readline, ''):
+                if line.strip():
+                    self.submit(output, line)
+        finally:
+            self.pool.close()
+            self.pool.join()
@@ -6,3 +6,4 @@ fi
 
 source ./venv/bin/activate
 pip install -r requirements.txt
+python -c 'import interpreter, syntax; syntax.build_tables()'
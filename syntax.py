@@ -1,7 +1,12 @@
-import ply.lex as lex
-import ply.yacc as yacc
+# PLY grammar of LISPer. Interpreter reads forms with reader module,
+# this parser is used only when passed to Interpreter explicitly.
+import os
+import sys
 from lisp import *
 
+# Directory of generated lextab.py and parsetab.py, see build_tables().
+TABLES = os.path.dirname(os.path.abspath(__file__))
+
 # Tokens list
 tokens = (
     'LPAREN',
@@ -12,6 +17,7 @@ tokens = (
     'QUOTE',
     'TICK',
     'COMMA',
+    'COMMA_AT',
     'TRUE',
     'NIL'
 )
@@ -22,6 +28,7 @@ t_RPAREN = r'\)'
 t_QUOTE = r'\''
 t_TICK = r'`'
 t_COMMA = r','
+t_COMMA_AT = r',@'
 t_TRUE = r't'
 t_NIL = r'nil'
 t_ignore = ' \t'
@@ -53,8 +60,6 @@ def t_error(t):
     print("Illegal character '{}'".format(t.value[0]))
 #    t.lexer.skip(1)
 
-lexer = lex.lex()
-
 # Parser rules
 def p_expr_atom(p):
     'expr : atom'
@@ -100,6 +105,10 @@ def p_list_comma(p):
     'list : COMMA expr'
     p[0] = [Symbol(c.UNQUOTE), p[2]]
 
+def p_list_comma_at(p):
+    'list : COMMA_AT expr'
+    p[0] = [Symbol(c.UNQUOTE_SPLICING), p[2]]
+
 def p_expr_list_item(p):
     'expr_list : expr'
     p[0] = [p[1]]
@@ -116,4 +125,45 @@ def p_error(p):
     else:
          print("Syntax error at EOF")
 
-parser = yacc.yacc()
+_parser = None
+
+
+def get_parser():
+    """Returns parser, constructing it on first use.
+
+    Tables are loaded from lextab.py and parsetab.py without validating
+    the grammar, they are generated (by build_tables) if missing.
+    """
+    global _parser
+    if _parser is None:
+        import ply.lex as lex
+        import ply.yacc as yacc
+
+        module = sys.modules[__name__]
+        lex.lex(module=module, optimize=1, lextab='lextab', outputdir=TABLES)
+        _parser = yacc.yacc(
+            module=module,
+            optimize=1,
+            debug=False,
+            tabmodule='parsetab',
+            outputdir=TABLES,
+            # TRUE and NIL tokens are knowingly unused.
+            errorlog=yacc.NullLogger()
+        )
+
+    return _parser
+
+
+def build_tables():
+    """Generates lexer and parser tables again, run after grammar changes."""
+    global _parser
+    for name in ('lextab', 'parsetab'):
+        for extension in ('.py', '.pyc'):
+            path = os.path.join(TABLES, name + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+    sys.modules.pop('lextab', None)
+    sys.modules.pop('parsetab', None)
+    _parser = None
+    return get_parser()
@@ -0,0 +1,70 @@
+from __future__ import print_function
+import collections
+import sys
+from lisp import *
+
+
+class Tracer(object):
+    """Receives forms evaluated by interpreter.
+
+    Tracer is attached with Interpreter.set_tracer(), engines do not pay
+    anything for tracing when no tracer is attached.
+    """
+    def trace(self, item):
+        raise NotImplementedError
+
+    def error(self, exception):
+        """Called when evaluation of top level form failed."""
+        pass
+
+
+class StreamTracer(Tracer):
+    """Writes every evaluated form to stream (stderr by default)."""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def trace(self, item):
+        stream = sys.stderr if self.stream is None else self.stream
+        stream.write("Running: {}\n".format(to_lisp(item)))
+
+
+class RingBufferTracer(Tracer):
+    """Remembers last `size` evaluated forms for post-mortem analysis.
+
+    Forms are kept as they are and serialized only when dumped.
+    """
+    def __init__(self, size=100, stream=None):
+        self.forms = collections.deque(maxlen=size)
+        self.stream = stream
+
+    def trace(self, item):
+        self.forms.append(item)
+
+    def error(self, exception):
+        self.dump()
+
+    def dump(self):
+        stream = sys.stderr if self.stream is None else self.stream
+        stream.write("Last {} evaluated form(s):\n".format(len(self.forms)))
+        for item in self.forms:
+            stream.write("  {}\n".format(to_lisp(item)))
+
+
+class SampledTracer(Tracer):
+    """Passes only every `every`-th form to wrapped tracer."""
+    def __init__(self, tracer, every):
+        if every < 1:
+            raise RuntimeError("Sampling interval must be positive.")
+
+        self.tracer = tracer
+        self.every = every
+        self.counter = 0
+
+    def trace(self, item):
+        self.counter += 1
+        if self.counter >= self.every:
+            self.counter = 0
+            self.tracer.trace(item)
+
+    def error(self, exception):
+        self.tracer.error(exception)
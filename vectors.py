@@ -0,0 +1,175 @@
+import array
+import itertools
+import math
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def buffer(items):
+    """Returns contiguous buffer of floats holding items."""
+    if numpy is not None:
+        return numpy.array(items, dtype=float)
+    return array.array('d', items)
+
+
+class Vector(object):
+    """Represents LISP vector, fixed sequence of floats.
+
+    Items live in contiguous buffer (NumPy array when NumPy is installed,
+    array.array otherwise), so arithmetic and reductions run in C loops.
+    Vectors are never modified once built, slices may share the buffer.
+
+    Arithmetic operators work elementwise, with number on either side
+    applied to every item.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        for x in self.data:
+            yield float(x)
+
+    def __getitem__(self, index):
+        return float(self.data[index])
+
+    def __nonzero__(self):
+        # Empty vector is not nil.
+        return True
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        return isinstance(other, Vector) and list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (vector, (list(self),))
+
+    def __add__(self, other):
+        return elementwise(operator.add, self, other)
+
+    def __radd__(self, other):
+        return elementwise(operator.add, other, self)
+
+    def __sub__(self, other):
+        return elementwise(operator.sub, self, other)
+
+    def __rsub__(self, other):
+        return elementwise(operator.sub, other, self)
+
+    def __mul__(self, other):
+        return elementwise(operator.mul, self, other)
+
+    def __rmul__(self, other):
+        return elementwise(operator.mul, other, self)
+
+    def __truediv__(self, other):
+        return elementwise(operator.truediv, self, other)
+
+    def __rtruediv__(self, other):
+        return elementwise(operator.truediv, other, self)
+
+
+def vector(items):
+    return Vector(buffer(items))
+
+
+def elementwise(operation, a, b):
+    """Returns vector of operation applied to items of vectors/numbers."""
+    if isinstance(a, Vector) and isinstance(b, Vector):
+        if len(a) != len(b):
+            raise RuntimeError(
+                "vector: lengths {} and {} differ.".format(len(a), len(b))
+            )
+        (x, y) = (a.data, b.data)
+    elif isinstance(a, Vector):
+        (x, y) = (a.data, b)
+    else:
+        (x, y) = (a, b.data)
+
+    if numpy is not None:
+        if operation is not operator.truediv:
+            return Vector(operation(x, y))
+
+        # Division by zero raises, like it does for numbers.
+        with numpy.errstate(divide='raise', invalid='raise'):
+            try:
+                return Vector(operation(x, y))
+            except FloatingPointError:
+                raise ZeroDivisionError("float division by zero")
+
+    if not isinstance(x, array.array):
+        x = itertools.repeat(x, len(y))
+    elif not isinstance(y, array.array):
+        y = itertools.repeat(y, len(x))
+
+    return Vector(array.array('d', map(operation, x, y)))
+
+
+def total(v):
+    if numpy is not None:
+        return float(v.data.sum())
+    return math.fsum(v.data)
+
+
+def dot(a, b):
+    if len(a) != len(b):
+        raise RuntimeError(
+            "vector-dot: lengths {} and {} differ.".format(len(a), len(b))
+        )
+
+    if numpy is not None:
+        return float(numpy.dot(a.data, b.data))
+    return math.fsum(map(operator.mul, a.data, b.data))
+
+
+def minimum(v):
+    if numpy is not None:
+        return float(v.data.min())
+    return min(v.data)
+
+
+def maximum(v):
+    if numpy is not None:
+        return float(v.data.max())
+    return max(v.data)
+
+
+# Functions vector-map applies in C loop, by name.
+FUNCTIONS = {
+    'abs': (abs, 'absolute'),
+    'sqrt': (math.sqrt, 'sqrt'),
+    'exp': (math.exp, 'exp'),
+    'log': (math.log, 'log'),
+    'sin': (math.sin, 'sin'),
+    'cos': (math.cos, 'cos'),
+    'floor': (math.floor, 'floor'),
+    'ceil': (math.ceil, 'ceil')
+}
+
+
+def apply(name, v):
+    """Returns vector of function named in FUNCTIONS applied to items."""
+    (function, ufunc) = FUNCTIONS[name]
+    if numpy is not None:
+        with numpy.errstate(divide='raise', invalid='raise'):
+            try:
+                return Vector(getattr(numpy, ufunc)(v.data))
+            except FloatingPointError:
+                raise ValueError("math domain error")
+
+    return Vector(array.array('d', map(function, v.data)))
@@ -0,0 +1,219 @@
+import interpreter
+from bytecode import *
+from lisp import *
+
+
+class VM(object):
+    """Stack machine running CodeObjects produced by bytecode.Compiler.
+
+    Calls of procedures compiled to bytecode do not recurse in Python:
+    caller state is saved on explicit call stack and TAILCALL reuses it,
+    so neither deep nor tail recursion is limited by Python stack.
+    """
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def enter(self, procedure, arguments):
+        """Returns frame for call of bytecode procedure."""
+        names = procedure.names
+        procedure.check_arity(arguments)
+
+        if len(names) > len(arguments):
+            arguments.extend(
+                [interpreter.UNBOUND] * (len(names) - len(arguments))
+            )
+
+        return interpreter.Frame(names, arguments, procedure.outer_scope)
+
+    def expand(self, site, value):
+        """Returns code evaluating call site whose head evaluated to value."""
+        if site.key is value:
+            return site.code
+
+        if isinstance(value, interpreter.Macro):
+            lisp = value.expand(site.args)
+        else:
+            lisp = [value] + site.args
+
+        compiler = self.interpreter.compiler
+        site.code = compiler.compile(lisp, site.env, site.tail)
+        site.key = value
+        return site.code
+
+    def execute(self, code, frame):
+        interp = self.interpreter
+        Macro = interpreter.Macro
+        UNBOUND = interpreter.UNBOUND
+
+        ops = code.ops
+        constants = code.constants
+        stack = []
+        calls = []
+        pc = 0
+
+        while True:
+            op = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+
+            if op == LOAD_LOCAL:
+                stack.append(frame.values[arg])
+            elif op == CONST:
+                stack.append(constants[arg])
+            elif op == PRIMITIVE:
+                call = constants[arg]
+                argc = call.argc
+                if argc:
+                    arguments = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    arguments = []
+                if interp.profiler is None:
+                    stack.append(call.function(interp, arguments))
+                else:
+                    stack.append(call.profiled(interp, arguments))
+            elif op == LOAD_FREE:
+                ref = constants[arg]
+                scope = frame
+                for names in ref.expected:
+                    if scope.names is not names:
+                        # Frame got variables defined at runtime.
+                        scope = frame
+                        break
+                    scope = scope.outer
+                stack.append(scope.get(ref.name))
+            elif op == DISPATCH:
+                site = constants[arg]
+                value = stack[-1]
+                if isinstance(value, Macro) or \
+                        (site.symbols and is_symbol(value)):
+                    # Expansion runs in current frame, like call returning
+                    # to the end of site (or replacing code, in tail site).
+                    stack.pop()
+                    if not site.tail:
+                        calls.append((code, site.end, frame, stack))
+                    stack = []
+                    code = self.expand(site, value)
+                    ops = code.ops
+                    constants = code.constants
+                    pc = 0
+            elif op == CALL or op == TAILCALL:
+                if arg:
+                    arguments = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    arguments = []
+                procedure = stack.pop()
+
+                if not isinstance(procedure, Procedure):
+                    raise RuntimeError("Not callable")
+
+                if type(procedure.code) is not CodeObject:
+                    stack.append(procedure(*arguments))
+                    continue
+
+                if op == CALL:
+                    calls.append((code, pc, frame, stack))
+                    stack = []
+                    if interp.profiler is not None:
+                        interp.profiler.enter(procedure.name)
+                elif interp.profiler is not None:
+                    interp.profiler.tail(procedure.name)
+
+                frame = self.enter(procedure, arguments)
+                code = procedure.code
+                ops = code.ops
+                constants = code.constants
+                pc = 0
+            elif op == RETURN:
+                value = stack.pop()
+                if not calls:
+                    return value
+
+                (code, pc, caller, stack) = calls.pop()
+                if caller is not frame and interp.profiler is not None:
+                    # Returning from procedure, not from macro expansion.
+                    interp.profiler.exit()
+                frame = caller
+                ops = code.ops
+                constants = code.constants
+                stack.append(value)
+            elif op == JUMP_IF_NIL:
+                if is_nil(stack.pop()):
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == POP:
+                stack.pop()
+            elif op == LOAD_DEREF:
+                ref = constants[arg]
+                scope = frame
+                for _ in range(ref.depth):
+                    scope = scope.outer
+                value = scope.values[ref.slot]
+                if value is UNBOUND:
+                    # Local variable not defined yet, use outer scope.
+                    value = scope.outer.get(ref.name)
+                stack.append(value)
+            elif op == STORE_LOCAL:
+                frame.values[arg] = stack.pop()
+            elif op == STORE_DEREF:
+                ref = constants[arg]
+                scope = frame
+                for _ in range(ref.depth):
+                    scope = scope.outer
+                if scope.values[ref.slot] is UNBOUND:
+                    # Local variable not defined yet, set in outer scope.
+                    scope.outer.set(ref.name, stack.pop())
+                else:
+                    scope.values[ref.slot] = stack.pop()
+            elif op == DEFINE:
+                name = constants[arg]
+                frame.define(name, named(stack.pop(), name))
+            elif op == SET:
+                frame.set(constants[arg], stack.pop())
+            elif op == JUMP_IF_FALSE:
+                if not stack.pop():
+                    pc = arg
+            elif op == CLOSURE:
+                body = constants[arg]
+                stack.append(Procedure(
+                    interp, body.parameters, body.body, frame, body, body.names
+                ))
+            elif op == MACRO:
+                body = constants[arg]
+                stack.append(Macro(
+                    interp, body.parameters, body.body, frame, body, body.names
+                ))
+            elif op == BUILTIN:
+                call = constants[arg]
+                stack.append(call.builtin(frame, call.args))
+            elif op == FORMAT:
+                args = constants[arg]
+                stack.append(interpreter.sprintf(args[0], *args[1:]))
+            elif op == SCOPED_PRIMITIVE:
+                call = constants[arg]
+                argc = call.argc
+                if argc:
+                    arguments = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    arguments = []
+                if interp.profiler is None:
+                    stack.append(call.function(interp, frame, arguments))
+                else:
+                    stack.append(call.profiled(interp, frame, arguments))
+            elif op == DEFINE_LOCAL:
+                frame.values[arg] = named(stack.pop(), frame.names[arg])
+            elif op == PROFILE:
+                body = constants[arg]
+                stack.append(interp.profile(lambda: self.execute(body, frame)))
+            elif op == CAPTURE:
+                body = constants[arg]
+                stack.append(
+                    interp.capture_output(lambda: self.execute(body, frame))
+                )
+            elif op == TRACE:
+                interp.tracer.trace(constants[arg])
+            else:
+                raise RuntimeError("Unknown opcode {}.".format(op))